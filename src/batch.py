@@ -0,0 +1,209 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import warnings
+from typing import Dict, Iterable, Iterator, List, Set, TextIO
+from ranking.cache import ResultCache
+from ranking.shards import CorpusRegistry, backend_factory
+
+warnings.filterwarnings("ignore")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Ranqueia docentes para uma lista de trabalhos lida em streaming (JSONL)"
+    )
+    parser.add_argument(
+        "-m", "--model",
+        type=str,
+        default="all-mpnet-base-v2",
+        help="Nome do modelo SentenceTransformer (ou 'tf-idf', 'bm25')"
+    )
+    parser.add_argument(
+        "-i", "--input",
+        type=str,
+        default="-",
+        help="Arquivo JSONL com um trabalho por linha ({'id', 'theme', 'summary' ou 'summary_file'}); '-' lê do stdin"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        type=str,
+        default="output/batch_ranking.jsonl",
+        help="Arquivo JSONL de saída, com um ranking por linha"
+    )
+    parser.add_argument(
+        "-b", "--batch-size",
+        type=int,
+        default=8,
+        help="Número de trabalhos processados por vez"
+    )
+    parser.add_argument(
+        "-k", "--top-k",
+        type=int,
+        default=10,
+        help="Número de docentes em cada ranking; 0 salva todos"
+    )
+    parser.add_argument(
+        "-c", "--checkpoint",
+        type=str,
+        default=None,
+        help="Arquivo com os ids já concluídos (padrão: <output>.ckpt)"
+    )
+    parser.add_argument(
+        "--data-root",
+        type=str,
+        default="../data",
+        help="Diretório com uma pasta de currículos por programa"
+    )
+    parser.add_argument(
+        "-p", "--programs",
+        type=str,
+        nargs="+",
+        default=["ppgcc"],
+        help="Programas (pastas em --data-root) consultados; 'all' usa todos"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default="../cache",
+        help="Diretório do cache de perfis e embeddings de cada programa"
+    )
+    parser.add_argument(
+        "--result-cache",
+        action="store_true",
+        help="Guarda os rankings em disco (em <cache-dir>/results) e reaproveita em execuções com o mesmo trabalho, modelo e currículos"
+    )
+    parser.add_argument(
+        "--max-papers",
+        type=int,
+        default=10,
+        help="Número de artigos mais recentes (por ano) usados de cada seção; 0 usa o histórico completo"
+    )
+    parser.add_argument(
+        "--since-year",
+        type=int,
+        default=None,
+        help="Considera apenas artigos publicados a partir deste ano"
+    )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=0,
+        help="Número de docentes pré-selecionados por busca léxica antes do modelo denso; 0 ranqueia todos"
+    )
+    parser.add_argument(
+        "--stem",
+        action="store_true",
+        help="Aplica stemming em português no modelo bm25"
+    )
+
+    return parser.parse_args()
+
+
+def read_theses(stream: TextIO) -> Iterator[Dict]:
+    """Reads theses from a JSONL stream, one at a time.
+
+    Each line has a 'theme' and either a 'summary' text or a 'summary_file' path.
+    Lines without an 'id' are identified by their line number.
+
+    Yields:
+        Dict: {'id': str, 'theme': str, 'summary': str}
+    """
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+
+        entry = json.loads(line)
+        summary = entry.get("summary", "")
+        if not summary and entry.get("summary_file"):
+            with open(entry["summary_file"], "r", encoding="utf-8") as file:
+                summary = file.read()
+
+        yield {
+            "id": str(entry.get("id", line_number)),
+            "theme": entry.get("theme", ""),
+            "summary": summary,
+        }
+
+
+def micro_batches(theses: Iterable[Dict], batch_size: int) -> Iterator[List[Dict]]:
+    """Groups a stream of theses in lists of up to `batch_size` items."""
+    iterator = iter(theses)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        yield batch
+
+
+def load_checkpoint(checkpoint_path: str) -> Set[str]:
+    """Ids of the theses already written by a previous run."""
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, "r", encoding="utf-8") as file:
+        return {line.strip() for line in file if line.strip()}
+
+
+def main():
+    args = parse_args()
+    checkpoint_path = args.checkpoint or args.output + ".ckpt"
+
+    done = load_checkpoint(checkpoint_path)
+    if done:
+        print(f"Retomando: {len(done)} trabalhos já concluídos em {checkpoint_path}", file=sys.stderr)
+
+    similarity_factory, backend, fingerprint = backend_factory(args.model, args.stem)
+    registry = CorpusRegistry(
+        args.data_root,
+        args.cache_dir,
+        similarity_factory,
+        backend,
+        args.max_papers or None,
+        args.since_year,
+        args.candidates or None,
+        result_cache=ResultCache(
+            disk_dir=os.path.join(args.cache_dir, "results") if args.result_cache else None
+        ),
+        model_fingerprint=fingerprint,
+    )
+    programs = registry.programs() if args.programs == ["all"] else args.programs
+
+    stream = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    pending = (thesis for thesis in read_theses(stream) if thesis["id"] not in done)
+
+    # both files are opened in append mode, so a resumed run keeps the previous results
+    with open(args.output, "a", encoding="utf-8") as output, \
+            open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        for batch in micro_batches(pending, args.batch_size):
+            rankings = registry.rank_batch(
+                [(thesis["theme"], thesis["summary"]) for thesis in batch],
+                programs,
+                args.top_k or None,
+            )
+
+            for thesis, ranking in zip(batch, rankings):
+                result = {
+                    "id": thesis["id"],
+                    "theme": thesis["theme"],
+                    "model": args.model,
+                    "ranking": [
+                        {"name": member.name, "lattes_id": member.lattes_id, "score": score}
+                        for member, score in ranking
+                    ],
+                }
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                output.flush()
+
+                # the id is only checkpointed after its ranking is on disk
+                checkpoint.write(thesis["id"] + "\n")
+                checkpoint.flush()
+                done.add(thesis["id"])
+
+            print(f"{len(done)} trabalhos concluídos", file=sys.stderr)
+
+    if stream is not sys.stdin:
+        stream.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple
 import argparse
 from logger import log
 
@@ -8,22 +8,37 @@ class Member:
         """
         Initialize a Member instance with information parsed from a Lattes CV.
 
+        The fields are read from `info` when used, so it may be a lazy `get_info()`
+        dictionary or a plain profile (see `ranking.pipeline.parse_profile`).
+
         Args:
             info (Dict): A dictionary containing the member's data, as returned by `get_info()`.
         """
-        self.name: str
-        self.lattes_id: str
-        self.research_areas: List[str]
-        self.periodic_papers: List[str]
-        self.congress_papers: List[str]
-        self.projects: List[str]
-
-        self.name = info["name"]
-        self.lattes_id = info["lattes_id"]
-        self.research_areas = info["research_areas"]
-        self.periodic_papers = info["periodic_papers"]
-        self.congress_papers = info["congress_papers"]
-        self.projects = info["projects"]
+        self.info = info
+
+    @property
+    def name(self) -> str:
+        return self.info["name"]
+
+    @property
+    def lattes_id(self) -> str:
+        return self.info["lattes_id"]
+
+    @property
+    def research_areas(self) -> List[str]:
+        return self.info["research_areas"]
+
+    @property
+    def periodic_papers(self) -> List[str]:
+        return self.info["periodic_papers"]
+
+    @property
+    def congress_papers(self) -> List[str]:
+        return self.info["congress_papers"]
+
+    @property
+    def projects(self) -> List[str]:
+        return self.info["projects"]
 
     def log_info(self) -> None:
         log(f"--- Professor Information ---")
@@ -44,3 +59,25 @@ class Member:
         log("\nProjects:")
         for project in self.projects:
             log(f"  - {project}")
+
+    def log_explanation(self, explanation: Dict[str, List[Tuple[str, float]]]) -> None:
+        """
+        Logs the items of each section that best matched a thesis.
+
+        Args:
+            explanation (Dict[str, List[Tuple[str, float]]]): Section -> [(item, score)], as returned by `RankingEngine.explain()`.
+        """
+        titles = {
+            "research_areas": "Research Areas",
+            "periodic_papers": "Periodic Papers",
+            "congress_papers": "Congress Papers",
+            "projects": "Projects",
+        }
+
+        log(f"--- Best matches: {self.name} ---")
+        for section, title in titles.items():
+            if section not in explanation:
+                continue
+            log(f"\n{title}:")
+            for item, score in explanation[section]:
+                log(f"  {score:.4f}  {item}")
@@ -0,0 +1,149 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from nltk.stem.snowball import SnowballStemmer
+from embedding.inverted_index import FIELDS, InvertedIndex, tokenize
+
+# same proportions of the MVP (docs/MVP.md): publications 0.5 (split between the two
+# publication sections), research lines 0.3, projects 0.2
+DEFAULT_FIELD_WEIGHTS = {
+    "research_areas": 1.5,
+    "periodic_papers": 1.25,
+    "congress_papers": 1.25,
+    "projects": 1.0,
+}
+
+
+class BM25Similarity:
+    """
+    BM25F similarity engine over an inverted index of the professors' section items.
+
+    The index is built once over the whole corpus with `fit` (RankingEngine calls it
+    with every member), so the IDF and the average field lengths do not depend on
+    which professors a query scores. Scoring a query only reads the postings of the
+    query terms; the cost does not depend on the vocabulary size.
+    """
+
+    def __init__(
+        self,
+        stemming: bool = False,
+        field_weights: Optional[Dict[str, float]] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ):
+        """
+        Initialize the engine.
+
+        Parameters
+        ----------
+        stemming : bool
+            Apply the Portuguese Snowball stemmer to documents and queries.
+        field_weights : Optional[Dict[str, float]]
+            BM25F weight of each section. Defaults to DEFAULT_FIELD_WEIGHTS.
+        k1 : float
+            Term frequency saturation.
+        b : float
+            Strength of the length normalization.
+        """
+        self.stemmer = None
+        if stemming:
+            self.stemmer = lru_cache(maxsize=None)(SnowballStemmer("portuguese").stem)
+        self.field_weights = field_weights or DEFAULT_FIELD_WEIGHTS
+        self.k1 = k1
+        self.b = b
+        self.index = InvertedIndex(FIELDS, self.stemmer)
+        # lattes_id -> document id in the index
+        self._doc_ids: Dict[str, int] = {}
+        self._infos: List[Dict] = []
+
+    def fit(self, infos: List[Dict]) -> "BM25Similarity":
+        """
+        Indexes the whole corpus, replacing any previous index.
+
+        Returns
+        -------
+        BM25Similarity
+            self
+        """
+        self._infos = list(infos)
+        self._doc_ids = {info.get("lattes_id"): i for i, info in enumerate(self._infos)}
+        self.index.build(self._infos)
+        return self
+
+    def _ensure_indexed(self, infos: List[Dict]) -> List[int]:
+        """Document ids of the professors.
+
+        Without `fit`, or for professors outside the fitted corpus, the index is rebuilt
+        with them added; RankingEngine fits the whole corpus first, so it never happens there.
+        """
+        new = [info for info in infos if info.get("lattes_id") not in self._doc_ids]
+        if new:
+            self.fit(self._infos + new)
+        return [self._doc_ids[info.get("lattes_id")] for info in infos]
+
+    def similarity_score(self, theme: str, summary: str, info: Dict) -> float:
+        """
+        BM25F score of a professor for a student's theme and summary.
+
+        Returns
+        -------
+        float
+        """
+        return float(self.similarity_scores([(theme, summary)], [info])[0, 0])
+
+    def similarity_scores(self, queries: List[Tuple[str, str]], infos: List[Dict]) -> np.ndarray:
+        """
+        Score several (theme, summary) queries against several professors.
+
+        Returns
+        -------
+        np.ndarray
+            Matrix (len(queries), len(infos)) of BM25F scores.
+        """
+        doc_ids = self._ensure_indexed(infos)
+
+        scores = np.zeros((len(queries), len(infos)))
+        for i, (theme, summary) in enumerate(queries):
+            all_scores = self.index.bm25f_scores(
+                (theme or "") + " " + (summary or ""), self.field_weights, self.k1, self.b
+            )
+            scores[i] = all_scores[doc_ids]
+        return scores
+
+    def explain(self, theme: str, summary: str, infos: List[Dict], top_n: int = 3) -> List[Dict[str, List[Tuple[str, float]]]]:
+        """
+        Find the items of each professor that are closest to the query.
+
+        Each item is scored as a short document with the corpus IDF and the
+        BM25 saturation, without length normalization.
+
+        Returns
+        -------
+        List[Dict[str, List[Tuple[str, float]]]]
+            For each professor, section -> [(item, score)], best score first.
+        """
+        self._ensure_indexed(infos)
+        query_terms = set(tokenize((theme or "") + " " + (summary or ""), self.stemmer))
+        idf = {term: self.index.idf(term) for term in query_terms}
+
+        explanations = []
+        for info in infos:
+            explanation = {}
+            for section in FIELDS:
+                items = info.get(section) or []
+                if not items:
+                    continue
+
+                item_scores = []
+                for item in items:
+                    tokens = tokenize(item, self.stemmer)
+                    score = 0.0
+                    for term in query_terms.intersection(tokens):
+                        tf = tokens.count(term)
+                        score += idf[term] * tf * (self.k1 + 1) / (tf + self.k1)
+                    item_scores.append((item, score))
+
+                item_scores.sort(key=lambda x: x[1], reverse=True)
+                explanation[section] = item_scores[:top_n]
+            explanations.append(explanation)
+        return explanations
@@ -0,0 +1,167 @@
+from typing import Callable, Dict, List, Optional
+import re
+import unicodedata
+import numpy as np
+import nltk
+from nltk.corpus import stopwords
+
+try:
+    nltk.data.find("corpora/stopwords")
+except:
+    nltk.download("stopwords")
+
+
+def strip_accents(text: str) -> str:
+    """Removes the accents of a text, e.g. 'Visão' -> 'Visao'."""
+    normalized = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in normalized if not unicodedata.combining(c))
+
+
+stopwords_pt = {strip_accents(word) for word in stopwords.words("portuguese")}
+
+# sections of get_info() indexed as separate fields
+FIELDS = ["research_areas", "periodic_papers", "congress_papers", "projects"]
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str, stemmer: Optional[Callable[[str], str]] = None) -> List[str]:
+    """Lowercases, removes accents and Portuguese stopwords, and optionally stems a text.
+
+    Args:
+        text (str): The text to be tokenized.
+        stemmer (Optional[Callable[[str], str]]): Function applied to each token.
+
+    Returns:
+        List[str]: The tokens, in text order.
+    """
+    tokens = [
+        token
+        for token in TOKEN_PATTERN.findall(strip_accents(text.lower()))
+        if len(token) > 1 and token not in stopwords_pt
+    ]
+    if stemmer is not None:
+        tokens = [stemmer(token) for token in tokens]
+    return tokens
+
+
+class InvertedIndex:
+    """
+    Inverted index over the section items of a list of professors.
+
+    Each term maps to its postings: the ids of the professors (documents) that
+    contain it and the term frequency in each field. Postings are numpy arrays,
+    so scoring a query only touches the postings of its terms.
+    """
+
+    def __init__(self, fields: List[str] = FIELDS, stemmer: Optional[Callable[[str], str]] = None):
+        """
+        Args:
+            fields (List[str]): Keys of the professor dicts to be indexed.
+            stemmer (Optional[Callable[[str], str]]): Function applied to each token.
+        """
+        self.fields = fields
+        self.stemmer = stemmer
+        self.n_docs = 0
+        # term -> (doc ids, term frequency per field with shape (n_postings, n_fields))
+        self.postings: Dict[str, tuple] = {}
+        # number of tokens of each field of each document, shape (n_docs, n_fields)
+        self.field_lengths = np.zeros((0, len(fields)), dtype=np.int32)
+
+    def build(self, infos: List[Dict]) -> "InvertedIndex":
+        """Indexes the professors, replacing any previous content.
+
+        Args:
+            infos (List[Dict]): Professor dicts as returned by `get_info()`. The position of
+                each dict is its document id.
+
+        Returns:
+            InvertedIndex: self
+        """
+        n_fields = len(self.fields)
+        counts: Dict[str, Dict[int, List[int]]] = {}
+        self.field_lengths = np.zeros((len(infos), n_fields), dtype=np.int32)
+
+        for doc, info in enumerate(infos):
+            for f, field in enumerate(self.fields):
+                for item in info.get(field) or []:
+                    tokens = tokenize(item, self.stemmer)
+                    self.field_lengths[doc, f] += len(tokens)
+                    for token in tokens:
+                        counts.setdefault(token, {}).setdefault(doc, [0] * n_fields)[f] += 1
+
+        self.postings = {
+            term: (
+                np.fromiter(docs.keys(), dtype=np.int32, count=len(docs)),
+                np.array(list(docs.values()), dtype=np.uint16),
+            )
+            for term, docs in counts.items()
+        }
+        self.n_docs = len(infos)
+        return self
+
+    def idf(self, term: str) -> float:
+        """Smoothed inverse document frequency of a term (0.0 if it is not indexed)."""
+        if term not in self.postings:
+            return 0.0
+        df = len(self.postings[term][0])
+        return float(np.log(1 + (self.n_docs - df + 0.5) / (df + 0.5)))
+
+    def tfidf_scores(self, text: str) -> np.ndarray:
+        """Log-scaled TF-IDF score of every document for a query.
+
+        Returns:
+            np.ndarray: One score per document; documents without any query term get 0.0.
+        """
+        scores = np.zeros(self.n_docs)
+        for term in set(tokenize(text, self.stemmer)):
+            if term not in self.postings:
+                continue
+            docs, tf = self.postings[term]
+            scores[docs] += (1 + np.log(tf.sum(axis=1))) * self.idf(term)
+
+        # long CVs would win only by having more words
+        lengths = self.field_lengths.sum(axis=1)
+        return scores / np.sqrt(np.maximum(lengths, 1))
+
+    def top_m(self, scores: np.ndarray, m: int) -> np.ndarray:
+        """Ids of the `m` best scored documents, best first."""
+        if m >= len(scores):
+            return np.argsort(-scores, kind="stable")
+        best = np.argpartition(-scores, m)[:m]
+        return best[np.argsort(-scores[best], kind="stable")]
+
+    def bm25f_scores(
+        self,
+        text: str,
+        field_weights: Dict[str, float],
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> np.ndarray:
+        """BM25F score of every document for a query.
+
+        The frequency of a term is summed over the fields, each one weighted and
+        normalized by its length relative to the average length of that field,
+        before the BM25 saturation is applied.
+
+        Args:
+            text (str): The query.
+            field_weights (Dict[str, float]): Weight of each field; missing fields weigh 0.
+            k1 (float): Term frequency saturation.
+            b (float): Strength of the length normalization.
+
+        Returns:
+            np.ndarray: One score per document; documents without any query term get 0.0.
+        """
+        weights = np.array([field_weights.get(field, 0.0) for field in self.fields])
+        avg_lengths = np.maximum(self.field_lengths.mean(axis=0), 1e-9)
+
+        scores = np.zeros(self.n_docs)
+        for term in set(tokenize(text, self.stemmer)):
+            if term not in self.postings:
+                continue
+            docs, tf = self.postings[term]
+            norm = 1 - b + b * self.field_lengths[docs] / avg_lengths
+            weighted_tf = (tf * weights / norm).sum(axis=1)
+            scores[docs] += self.idf(term) * weighted_tf / (k1 + weighted_tf)
+        return scores
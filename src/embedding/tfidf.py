@@ -1,6 +1,6 @@
 import os
 import numpy as np
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from deep_translator import GoogleTranslator
@@ -279,4 +279,68 @@ class TFIDFSimilarity:
 
         return float(np.mean(scores)) if scores else 0.0
 
- 
\ No newline at end of file
+    def similarity_scores(self, queries: List[Tuple[str, str]], infos: List[Dict]) -> np.ndarray:
+        """
+        Score several (theme, summary) queries against several professors.
+
+        Parameters
+        ----------
+        queries : List[Tuple[str, str]]
+        infos : List[Dict]
+
+        Returns
+        -------
+        np.ndarray
+            Matrix (len(queries), len(infos)) with the similarity_score of each pair.
+        """
+        scores = np.zeros((len(queries), len(infos)))
+        for i, (theme, summary) in enumerate(queries):
+            for j, info in enumerate(infos):
+                scores[i, j] = self.similarity_score(theme, summary, info)
+        return scores
+
+    def explain(self, theme: str, summary: str, infos: List[Dict], top_n: int = 3) -> List[Dict[str, List[Tuple[str, float]]]]:
+        """
+        Find the items of each professor that are closest to the query.
+
+        All items of all professors are transformed and compared with the
+        student vector in a single pass.
+
+        Parameters
+        ----------
+        theme : str
+        summary : str
+        infos : List[Dict]
+            Professor dicts with textual lists, e.g. the top of a ranking.
+        top_n : int
+            Number of items kept per section.
+
+        Returns
+        -------
+        List[Dict[str, List[Tuple[str, float]]]]
+            For each professor, section -> [(item, score)], best score first.
+        """
+        sections = ["research_areas", "periodic_papers", "congress_papers", "projects"]
+        blocks = [
+            (i, section, info[section])
+            for i, info in enumerate(infos)
+            for section in sections
+            if info.get(section)
+        ]
+
+        explanations = [{} for _ in infos]
+        if not blocks or not self._fitted:
+            return explanations
+
+        student_vec = self.embed_student(theme, summary)
+        items = [item for _, _, section_items in blocks for item in section_items]
+        scores = cosine_similarity([student_vec], self.vectorizer.transform(items))[0]
+
+        offset = 0
+        for i, section, section_items in blocks:
+            section_scores = scores[offset:offset + len(section_items)]
+            offset += len(section_items)
+
+            best = np.argsort(-section_scores)[:top_n]
+            explanations[i][section] = [(section_items[j], float(section_scores[j])) for j in best]
+        return explanations
@@ -1,12 +1,10 @@
 import os
 import argparse
+import time
 import warnings
-from commitee.professors import Member
 from logger import init_logger, log
-from scraping.LattesParser import LattesParser
-from similarity.similarity import SentenceTransformerSimilarity
-from embedding.tfidf import TFIDFSimilarity
-from tqdm import tqdm
+from ranking.cache import ResultCache
+from ranking.shards import CorpusRegistry, backend_factory
 
 import warnings
 warnings.filterwarnings("ignore")
@@ -17,7 +15,7 @@ def parse_args():
         "-m", "--model",
         type=str,
         default="all-mpnet-base-v2",
-        help="Nome do modelo SentenceTransformer"
+        help="Nome do modelo SentenceTransformer (ou 'tf-idf', 'bm25')"
         # Algumas sugestões de modelos:
         # paraphrase-multilingual-mpnet-base-v2
         # distiluse-base-multilingual-cased-v2
@@ -43,6 +41,88 @@ def parse_args():
         default="ranking_output",
         help="Nome pro arquivo de saída"
     )
+    parser.add_argument(
+        "--data-root",
+        type=str,
+        default="../data",
+        help="Diretório com uma pasta de currículos por programa"
+    )
+    parser.add_argument(
+        "-p", "--programs",
+        type=str,
+        nargs="+",
+        default=["ppgcc"],
+        help="Programas (pastas em --data-root) consultados; 'all' usa todos"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default="../cache",
+        help="Diretório do cache de perfis e embeddings de cada programa"
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Reconstrói o cache dos programas selecionados"
+    )
+    parser.add_argument(
+        "--result-cache",
+        action="store_true",
+        help="Guarda os rankings em disco (em <cache-dir>/results) e reaproveita em execuções com o mesmo trabalho, modelo e currículos"
+    )
+    parser.add_argument(
+        "-w", "--watch",
+        type=float,
+        default=0,
+        help="Continua rodando e refaz o ranking quando um currículo é adicionado, alterado ou removido, verificando a cada N segundos; 0 desativa"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=min(4, os.cpu_count() or 1),
+        help="Número de processos que leem os currículos enquanto o modelo gera os embeddings; 0 lê no próprio processo"
+    )
+    parser.add_argument(
+        "--encode-batch",
+        type=int,
+        default=8,
+        help="Número de currículos codificados de uma vez pelo modelo"
+    )
+    parser.add_argument(
+        "--max-papers",
+        type=int,
+        default=10,
+        help="Número de artigos mais recentes (por ano) usados de cada seção; 0 usa o histórico completo"
+    )
+    parser.add_argument(
+        "--since-year",
+        type=int,
+        default=None,
+        help="Considera apenas artigos publicados a partir deste ano"
+    )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=0,
+        help="Número de docentes pré-selecionados por busca léxica antes do modelo denso; 0 ranqueia todos"
+    )
+    parser.add_argument(
+        "--ann",
+        type=int,
+        default=0,
+        help="Ranqueia só os K docentes mais próximos com um índice aproximado (IVF) e lista os K itens mais próximos do corpus; 0 usa a busca exata"
+    )
+    parser.add_argument(
+        "--stem",
+        action="store_true",
+        help="Aplica stemming em português no modelo bm25"
+    )
+    parser.add_argument(
+        "-e", "--explain",
+        type=int,
+        default=0,
+        help="Mostra os N itens de cada seção mais similares ao trabalho para o top 5; 0 desativa"
+    )
 
     return parser.parse_args()
 
@@ -85,28 +165,41 @@ def main():
 
     print("\n\n--- Analyzing Lattes profiles and calculating recommendations ---")
 
-    DATA_DIR = "../data/ppgcc"
-
-    html_files = [f for f in os.listdir(DATA_DIR) if f.endswith(".html")]
-
-    if args.model == "tf-idf":
-        similarity = TFIDFSimilarity()
-    else: 
-        similarity = SentenceTransformerSimilarity(args.model)
+    if args.ann and args.model in ("tf-idf", "bm25"):
+        raise ValueError("--ann is only available for SentenceTransformer models.")
 
-    member_list = []
-    for html_file in tqdm(html_files, desc="Processando currículos", unit="arquivo"):
-        file_path = os.path.join(DATA_DIR, html_file)
+    similarity_factory, backend, fingerprint = backend_factory(args.model, args.stem)
 
-        parser = LattesParser(file_path)
-        prof_info = parser.get_info()
-
-        score = similarity.similarity_score(theme, resumo, prof_info)
-
-        member = Member(prof_info)
-        member_list.append((member, score))
+    registry = CorpusRegistry(
+        args.data_root,
+        args.cache_dir,
+        similarity_factory,
+        backend,
+        args.max_papers or None,
+        args.since_year,
+        args.candidates or None,
+        args.ann or None,
+        ResultCache(disk_dir=os.path.join(args.cache_dir, "results") if args.result_cache else None),
+        args.workers,
+        args.encode_batch,
+        fingerprint,
+    )
+    programs = registry.programs() if args.programs == ["all"] else args.programs
+    for program in programs:
+        if args.rebuild:
+            registry.rebuild(program)
+        else:
+            registry.shard(program)
+        if registry.shards[program].pipeline is not None:
+            print(f"\n--- Pipeline de {program} ---")
+            print(registry.shards[program].pipeline.report())
+        for html_file, failure in registry.shards[program].failed.items():
+            print(f"Falha ao ler {program}/{html_file}: {failure['error']}")
 
-    member_list.sort(key=lambda x: x[1], reverse=True)
+    start = time.perf_counter()
+    member_list = registry.rank(theme, resumo, programs, k=args.ann or None)
+    cache_status = "cache" if registry.result_cache.hits else "calculado"
+    print(f'\nRanking ({cache_status}) em {(time.perf_counter() - start) * 1000:.1f} ms')
 
     log(f'Título do trabalho: {args.theme}')
     log(f'Resumo do trabalho: {resumo}')
@@ -121,8 +214,52 @@ def main():
         log('\n')
         member.log_info()
         log('\n')
-    
+
+    if args.ann:
+        log(f"\n\n --- {args.ann} closest items in the corpus ---")
+        items = [
+            item
+            for program in programs
+            for item in registry.shard(program).engine.closest_items(theme, resumo, args.ann)
+        ]
+        items.sort(key=lambda x: x[3], reverse=True)
+        for member, section, item, score in items[:args.ann]:
+            log(f"  {score:.4f}  [{member.name} | {section}] {item}")
+
+    if args.explain:
+        start = time.perf_counter()
+        explanations = registry.explain(theme, resumo, member_list, top_k=5, top_n=args.explain)
+        elapsed = time.perf_counter() - start
+
+        log("\n\n --- Best matching items for the top 5 recommendations ---")
+        for member, score, explanation in explanations:
+            log('\n')
+            member.log_explanation(explanation)
+        print(f'\nExplicações calculadas em {elapsed * 1000:.1f} ms')
+
     print(f'Logs salvos em {output}')
 
+    if args.watch:
+        print(f"\nMonitorando {', '.join(programs)} (Ctrl+C para sair)")
+        try:
+            for changed in registry.watch(programs, args.watch):
+                log("\n\n--- Currículos atualizados ---")
+                for program, changes in changed.items():
+                    for kind in ("added", "modified", "removed"):
+                        for html_file in getattr(changes, kind):
+                            log(f"{program}/{html_file}: {kind}")
+                    for html_file in changes.failed:
+                        error = registry.shards[program].failed[html_file]["error"]
+                        log(f"{program}/{html_file}: failed ({error})")
+                    if changes.added or changes.modified:
+                        print(registry.shards[program].pipeline.report())
+
+                member_list = registry.rank(theme, resumo, programs, k=args.ann or None)
+                log("\n--- Ranking ---")
+                for member, score in member_list:
+                    log(f"{member.name:40s}  ->  {score:.4f}")
+        except KeyboardInterrupt:
+            pass
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,118 @@
+import argparse
+import os
+import time
+from typing import List, Tuple
+from ranking.shards import CorpusRegistry, backend_factory
+
+# theses already used in the experiments of output/
+QUERIES = [
+    (
+        "Segmentação e Detecção de Buracos em vias Utilizando Visão Computacional em Sistemas Embarcados Críticos em Prol de ADAS e Veículos Autônomos",
+        "./summary/sum.txt",
+    ),
+    (
+        "Análise de texturas em imagens de sensores para diagnóstico de doenças: um estudo sobre transformadas baseadas em redes complexas",
+        "./summary/sum3.txt",
+    ),
+    ("Analise de Modelos de Lingua de Baixo Custo", "./summary/sum4.txt"),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compara o ranking em dois estágios (léxico + denso) com o ranking denso completo"
+    )
+    parser.add_argument("-m", "--model", type=str, default="all-mpnet-base-v2")
+    parser.add_argument(
+        "-c", "--candidates",
+        type=int,
+        nargs="+",
+        default=[5, 10, 20],
+        help="Valores de M (candidatos do estágio léxico) a serem testados"
+    )
+    parser.add_argument("-k", "--top-k", type=int, default=5, help="k do recall@k")
+    parser.add_argument("--data-root", type=str, default="../data")
+    parser.add_argument("-p", "--programs", type=str, nargs="+", default=["ppgcc"])
+    parser.add_argument("--cache-dir", type=str, default="../cache")
+    parser.add_argument(
+        "-r", "--repeat",
+        type=int,
+        default=20,
+        help="Número de vezes que as consultas são ranqueadas para medir o tempo"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        type=str,
+        default=None,
+        help="Arquivo em que a tabela é salva (padrão: ./output/benchmark_<modelo>.txt)"
+    )
+    return parser.parse_args()
+
+
+def load_queries() -> List[Tuple[str, str]]:
+    queries = []
+    for theme, summary_file in QUERIES:
+        with open(summary_file, "r", encoding="utf-8") as file:
+            queries.append((theme, file.read()))
+    return queries
+
+
+def timed_rankings(args, similarity_factory, backend: str, fingerprint: str, queries, candidates=None):
+    """Ranks the queries through the corpus registry.
+
+    The shards are loaded (or built) from the cache and the queries are ranked once
+    before the clock starts, so the time is the query latency: encoding the queries
+    and scoring the candidates. It is the mean over `args.repeat` runs, in ms per query.
+    """
+    registry = CorpusRegistry(
+        args.data_root,
+        args.cache_dir,
+        similarity_factory,
+        backend,
+        candidates=candidates,
+        model_fingerprint=fingerprint,
+    )
+    for program in args.programs:
+        registry.shard(program)
+
+    rankings = [registry.rank(theme, summary, args.programs) for theme, summary in queries]
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for theme, summary in queries:
+            registry.rank(theme, summary, args.programs)
+    return rankings, (time.perf_counter() - start) * 1000 / (args.repeat * len(queries))
+
+
+def main():
+    args = parse_args()
+    similarity_factory, backend, fingerprint = backend_factory(args.model)
+    queries = load_queries()
+
+    full, full_time = timed_rankings(args, similarity_factory, backend, fingerprint, queries)
+    full_top = [{m.lattes_id for m, _ in ranking[:args.top_k]} for ranking in full]
+
+    lines = [
+        f"Modelo: {args.model} ({fingerprint}) | {len(full[0])} docentes | {len(queries)} consultas"
+        f" | {args.repeat} repetições",
+        f"{'M':>6}  {'recall@' + str(args.top_k):>10}  {'ms/consulta':>12}  {'economia':>9}",
+        f"{'todos':>6}  {1.0:>10.3f}  {full_time:>12.2f}  {0.0:>9.1%}",
+    ]
+
+    for m in args.candidates:
+        hybrid, hybrid_time = timed_rankings(args, similarity_factory, backend, fingerprint, queries, m)
+        recalls = [
+            len(expected & {member.lattes_id for member, _ in ranking[:args.top_k]}) / len(expected)
+            for expected, ranking in zip(full_top, hybrid)
+        ]
+        recall = sum(recalls) / len(recalls)
+        lines.append(f"{m:>6}  {recall:>10.3f}  {hybrid_time:>12.2f}  {1 - hybrid_time / full_time:>9.1%}")
+
+    print("\n" + "\n".join(lines))
+    output = args.output or f"./output/benchmark_{os.path.basename(args.model.rstrip('/'))}.txt"
+    with open(output, "w", encoding="utf-8") as file:
+        file.write("\n".join(lines) + "\n")
+    print(f"Tabela salva em {output}")
+
+
+if __name__ == "__main__":
+    main()
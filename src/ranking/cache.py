@@ -0,0 +1,118 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+import unicodedata
+
+
+def normalize_text(text: str) -> str:
+    """Unicode NFC with runs of whitespace collapsed, so re-pasted texts hit the same entry."""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+class ResultCache:
+    """
+    Cache of rankings, with LRU eviction in memory and an optional tier on disk.
+
+    Entries are keyed by the normalized query, the model, the section weights and a
+    fingerprint of the corpus. A changed CV or model gives new keys, so stale rankings
+    are never returned; they are evicted like any other unused entry.
+    """
+
+    def __init__(self, max_entries: int = 256, disk_dir: Optional[str] = None, max_disk_entries: int = 4096):
+        """
+        Args:
+            max_entries (int): Number of rankings kept in memory.
+            disk_dir (Optional[str]): Directory of the disk tier, one JSON file per entry.
+                Without it only the memory tier is used.
+            max_disk_entries (int): Number of files kept in `disk_dir`; the least recently
+                used ones are deleted.
+        """
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self._entries: "OrderedDict[str, List[Tuple[str, str, float]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def key(
+        theme: str,
+        summary: str,
+        model: str,
+        section_weights: Optional[Dict[str, float]],
+        fingerprint: str,
+        **options,
+    ) -> str:
+        """Hash of everything that changes a ranking.
+
+        Args:
+            theme (str): Title of the thesis.
+            summary (str): Summary of the thesis.
+            model (str): Name and version of the backend, e.g. 'bm25' or the fingerprint of a
+                SentenceTransformer model (see model_fingerprint).
+            section_weights (Optional[Dict[str, float]]): Weight of each section in the score.
+            fingerprint (str): Fingerprint of the corpus (see CorpusRegistry.fingerprint).
+            **options: Other settings of the ranking, e.g. candidates or top_k.
+        """
+        payload = json.dumps(
+            [normalize_text(theme), normalize_text(summary), model, section_weights, fingerprint, options],
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key + ".json")
+
+    def get(self, key: str) -> Optional[List[Tuple[str, str, float]]]:
+        """The ranking stored for a key, as (program, lattes_id, score), or None."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+        if self.disk_dir and os.path.exists(self._disk_path(key)):
+            with open(self._disk_path(key), "r", encoding="utf-8") as file:
+                ranking = [tuple(entry) for entry in json.load(file)]
+            # the mtime orders the disk tier by last use
+            os.utime(self._disk_path(key))
+            self._remember(key, ranking)
+            self.hits += 1
+            return ranking
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, ranking: List[Tuple[str, str, float]]) -> None:
+        """Stores a ranking given as (program, lattes_id, score)."""
+        self._remember(key, ranking)
+        if not self.disk_dir:
+            return
+
+        # written aside and renamed, so a reader never sees half a file
+        with open(self._disk_path(key) + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(ranking, file)
+        os.replace(self._disk_path(key) + ".tmp", self._disk_path(key))
+
+        files = [f for f in os.listdir(self.disk_dir) if f.endswith(".json")]
+        if len(files) > self.max_disk_entries:
+            files.sort(key=lambda f: os.path.getmtime(os.path.join(self.disk_dir, f)))
+            for old_file in files[:len(files) - self.max_disk_entries]:
+                os.remove(os.path.join(self.disk_dir, old_file))
+
+    def _remember(self, key: str, ranking: List[Tuple[str, str, float]]) -> None:
+        self._entries[key] = ranking
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drops every entry, in memory and on disk."""
+        self._entries.clear()
+        if self.disk_dir:
+            for cache_file in os.listdir(self.disk_dir):
+                os.remove(os.path.join(self.disk_dir, cache_file))
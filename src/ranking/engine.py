@@ -0,0 +1,184 @@
+from typing import Dict, List, Optional, Tuple
+import os
+import numpy as np
+from tqdm import tqdm
+from commitee.professors import Member
+from embedding.inverted_index import InvertedIndex
+from scraping.LattesParser import LattesParser
+
+
+def load_members(
+    data_dir: str,
+    max_papers: Optional[int] = 10,
+    since_year: Optional[int] = None,
+) -> List[Member]:
+    """Parses every Lattes HTML file of a directory.
+
+    Args:
+        data_dir (str): Directory with the HTML Lattes CVs.
+        max_papers (Optional[int]): Passed to LattesParser.
+        since_year (Optional[int]): Passed to LattesParser.
+
+    Returns:
+        List[Member]: One member per CV, in file name order.
+    """
+    html_files = sorted(f for f in os.listdir(data_dir) if f.endswith(".html"))
+
+    members = []
+    for html_file in tqdm(html_files, desc="Processando currículos", unit="arquivo"):
+        file_path = os.path.join(data_dir, html_file)
+        parser = LattesParser(file_path, max_papers, since_year)
+        members.append(Member(parser.get_info()))
+    return members
+
+
+class RankingEngine:
+    """
+    Ranks the professors of a corpus for one or more theses with a similarity backend.
+    """
+
+    def __init__(
+        self,
+        similarity,
+        members: List[Member],
+        candidates: Optional[int] = None,
+        top_k: Optional[int] = None,
+    ):
+        """
+        Args:
+            similarity: A backend with `similarity_scores(queries, infos)`, such as
+                SentenceTransformerSimilarity or TFIDFSimilarity.
+            members (List[Member]): The professors to be ranked.
+            candidates (Optional[int]): If set, a lexical stage over an inverted index keeps
+                only this many professors per query, and only those are scored by `similarity`.
+            top_k (Optional[int]): If set, rankings only have the k best professors, found with
+                the approximate nearest neighbour index of the backend (SentenceTransformerSimilarity).
+                The index is built unless the backend already has one built with the same model
+                over the same content of these members.
+        """
+        self.similarity = similarity
+        self.members = members
+        self.candidates = candidates
+        self.top_k = top_k
+        self.index = None
+        # corpus statistics (e.g. BM25 IDF) come from every member, not from the candidates
+        if hasattr(similarity, "fit"):
+            similarity.fit([member.info for member in members])
+        if candidates:
+            self.index = InvertedIndex().build([member.info for member in members])
+        if top_k and not similarity.ann_is_current([member.info for member in members]):
+            similarity.build_ann([member.info for member in members])
+        # dense backends score every query against one matrix, stacked once per engine
+        self._matrix = None
+        if hasattr(similarity, "professor_matrix") and not top_k:
+            self._matrix = similarity.professor_matrix([member.info for member in members])
+        self._by_id = {member.lattes_id: member for member in members}
+
+    def member(self, lattes_id: str) -> Member:
+        """The member with a lattes_id."""
+        return self._by_id[lattes_id]
+
+    def prefilter(self, theme: str, summary: str) -> List[int]:
+        """Positions in `members` of the lexical top-`candidates` for a query, best first."""
+        scores = self.index.tfidf_scores(theme + " " + summary)
+        return [int(i) for i in self.index.top_m(scores, self.candidates)]
+
+    def rank(self, theme: str, summary: str) -> List[Tuple[Member, float]]:
+        """Ranks all members for a single thesis, best score first."""
+        return self.rank_batch([(theme, summary)])[0]
+
+    def rank_batch(
+        self, queries: List[Tuple[str, str]], query_embeddings: Optional[np.ndarray] = None
+    ) -> List[List[Tuple[Member, float]]]:
+        """Ranks all members for a micro-batch of (theme, summary) queries.
+
+        With `candidates`, each ranking only has the members kept by the lexical stage,
+        and the backend scores the union of the candidates of the batch. This is a
+        recall/latency trade-off: a dense backend only skips part of one matrix product,
+        since the queries are encoded either way (see ranking.benchmark).
+
+        Args:
+            queries (List[Tuple[str, str]]): The (theme, summary) of each thesis.
+            query_embeddings (Optional[np.ndarray]): The queries already encoded by a dense
+                backend, e.g. once for several engines. Encoded here if not given.
+
+        Returns:
+            List[List[Tuple[Member, float]]]: One ranking per query, best score first.
+        """
+        if hasattr(self.similarity, "query_embeddings"):
+            if query_embeddings is None:
+                query_embeddings = self.similarity.query_embeddings(queries)
+            else:
+                self.similarity.use_query_embeddings(queries, query_embeddings)
+
+        if self.top_k:
+            return [
+                [
+                    (self._by_id[lattes_id], score)
+                    for lattes_id, score in self.similarity.top_k_professors(embedding, self.top_k)
+                ]
+                for embedding in query_embeddings
+            ]
+
+        if self.index is None:
+            selected = [list(range(len(self.members)))] * len(queries)
+        else:
+            selected = [self.prefilter(theme, summary) for theme, summary in queries]
+
+        pool = sorted({i for candidates in selected for i in candidates})
+        column = {member: j for j, member in enumerate(pool)}
+        if self._matrix is not None:
+            matrix = self._matrix if self.index is None else self._matrix[pool]
+            scores = self.similarity.scores_from_embeddings(query_embeddings, matrix)
+        else:
+            scores = self.similarity.similarity_scores(
+                queries, [self.members[i].info for i in pool]
+            )
+
+        rankings = []
+        for row, candidates in zip(scores, selected):
+            ranking = [(self.members[i], float(row[column[i]])) for i in candidates]
+            ranking.sort(key=lambda x: x[1], reverse=True)
+            rankings.append(ranking)
+        return rankings
+
+    def explain(
+        self,
+        theme: str,
+        summary: str,
+        ranking: List[Tuple[Member, float]],
+        top_k: int = 5,
+        top_n: int = 3,
+    ) -> List[Tuple[Member, float, Dict[str, List[Tuple[str, float]]]]]:
+        """Finds the items that drove the score of the top-k members of a ranking.
+
+        Args:
+            theme (str): Title of the thesis.
+            summary (str): Summary of the thesis.
+            ranking (List[Tuple[Member, float]]): A ranking returned by `rank`.
+            top_k (int): Number of members explained.
+            top_n (int): Number of items kept per section.
+
+        Returns:
+            List[Tuple[Member, float, Dict[str, List[Tuple[str, float]]]]]: (member, score, section -> [(item, score)]).
+        """
+        top = ranking[:top_k]
+        explanations = self.similarity.explain(
+            theme, summary, [member.info for member, _ in top], top_n
+        )
+        return [
+            (member, score, explanation)
+            for (member, score), explanation in zip(top, explanations)
+        ]
+
+    def closest_items(self, theme: str, summary: str, k: int = 10) -> List[Tuple[Member, str, str, float]]:
+        """The k section items of the whole corpus closest to a thesis, using the item index.
+
+        Returns:
+            List[Tuple[Member, str, str, float]]: (member, section, item, score), best first.
+        """
+        results = []
+        for (lattes_id, section, position), score in self.similarity.top_k_items(theme, summary, k):
+            member = self._by_id[lattes_id]
+            results.append((member, section, member.info[section][position], score))
+        return results
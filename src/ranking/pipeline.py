@@ -0,0 +1,248 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import queue
+import threading
+import time
+from scraping.LattesParser import LattesParser
+
+# marks the end of the stream in a queue
+_DONE = object()
+
+# keys of get_info() used by the ranking: the Member fields and the sections read by the backends
+PROFILE_KEYS = ("name", "lattes_id", "research_areas", "periodic_papers", "congress_papers", "projects")
+
+
+def parse_profile(
+    path: str,
+    max_papers: Optional[int] = 10,
+    since_year: Optional[int] = None,
+    keys: Sequence[str] = PROFILE_KEYS,
+) -> Dict:
+    """Parses one CV into a plain dict with only `keys`, so the profile can cross processes.
+
+    Only the loaders of these keys run. The publication history ('periodic_records',
+    'congress_records') is read to select the latest papers, but it is not kept in the
+    profile. The HTML itself is always parsed when the LattesParser is created.
+    """
+    info = LattesParser(path, max_papers, since_year).get_info()
+    return {key: info[key] for key in keys}
+
+
+class StageStats:
+    """Time and queue measurements of one stage of a Pipeline."""
+
+    def __init__(self, name: str, workers: int = 1):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        # time spent doing work, summed over the workers
+        self.busy = 0.0
+        # time spent waiting for room in the next queue (backpressure)
+        self.blocked = 0.0
+        # depth of the input queue, sampled at every read
+        self.depths: List[int] = []
+        self.lock = threading.Lock()
+
+    def add(self, items: int, busy: float) -> None:
+        with self.lock:
+            self.items += items
+            self.busy += busy
+
+    def put(self, output: queue.Queue, item) -> None:
+        """Puts an item in the next queue, measuring how long it waited for room."""
+        start = time.perf_counter()
+        output.put(item)
+        with self.lock:
+            self.blocked += time.perf_counter() - start
+
+    def get(self, source: queue.Queue):
+        """Takes an item from the input queue, sampling its depth."""
+        with self.lock:
+            self.depths.append(source.qsize())
+        return source.get()
+
+
+class Pipeline:
+    """
+    Staged pipeline that builds the profiles of a list of CVs:
+
+        parse (N workers) -> queue -> encode (micro-batches) -> queue -> store (sink)
+
+    It stops at the stored profiles and embeddings: nothing is scored or ranked here.
+    A thesis is ranked later, at query time, against the profiles the pipeline stored,
+    so the per-CV work is done once per CV change rather than once per query.
+
+    The queues are bounded, so a fast stage blocks (backpressure) instead of piling
+    up profiles in memory, and the stages overlap: while a batch is encoded, the
+    next CVs are being parsed. The total time approaches that of the slowest stage.
+
+    A CV that fails to parse (e.g. a file still being copied) is left out and listed
+    in `failed`; an error in the other stages stops the pipeline.
+    """
+
+    def __init__(
+        self,
+        parse: Callable[[str], Dict],
+        encode: Callable[[List[Dict]], None],
+        sink: Callable[[List[Tuple[str, Dict]]], None],
+        workers: int = 4,
+        batch_size: int = 8,
+        queue_size: int = 16,
+    ):
+        """
+        Args:
+            parse (Callable[[str], Dict]): Parses a CV into a profile. It runs in worker
+                processes, so it must be picklable (e.g. a partial of `parse_profile`).
+            encode (Callable[[List[Dict]], None]): Encodes a micro-batch of profiles.
+            sink (Callable[[List[Tuple[str, Dict]]], None]): Receives each encoded batch
+                as (path, profile), in the calling thread.
+            workers (int): Number of parser processes; 0 parses in threads of this process.
+            batch_size (int): Maximum number of profiles encoded at once.
+            queue_size (int): Capacity of each queue between stages.
+        """
+        self.parse = parse
+        self.encode = encode
+        self.sink = sink
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.stats: List[StageStats] = []
+        self.elapsed = 0.0
+        # (path, error) of the CVs that could not be parsed in the last run
+        self.failed: List[Tuple[str, Exception]] = []
+
+    def run(self, paths: Iterable[str]) -> "Pipeline":
+        """Runs every CV through the stages; exceptions of any stage are raised here.
+
+        Returns:
+            Pipeline: self, with `stats` and `elapsed` of this run.
+        """
+        parsed: queue.Queue = queue.Queue(self.queue_size)
+        encoded: queue.Queue = queue.Queue(self.queue_size)
+        parse_stats = StageStats("parse", max(self.workers, 1))
+        encode_stats = StageStats("encode")
+        sink_stats = StageStats("store")
+        self.stats = [parse_stats, encode_stats, sink_stats]
+        self.failed = []
+        errors: List[BaseException] = []
+
+        paths = iter(paths)
+        paths_lock = threading.Lock()
+        # spawned, not forked: the calling process may hold a loaded model and running
+        # threads (e.g. other shards), and a fork of it can deadlock
+        executor = (
+            ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            if self.workers
+            else None
+        )
+        running = [parse_stats.workers]
+
+        def parser() -> None:
+            try:
+                while not errors:
+                    with paths_lock:
+                        path = next(paths, None)
+                    if path is None:
+                        break
+                    start = time.perf_counter()
+                    try:
+                        if executor is not None:
+                            profile = executor.submit(self.parse, path).result()
+                        else:
+                            profile = self.parse(path)
+                    except Exception as error:
+                        with paths_lock:
+                            self.failed.append((path, error))
+                        continue
+                    finally:
+                        parse_stats.add(1, time.perf_counter() - start)
+                    parse_stats.put(parsed, (path, profile))
+            except BaseException as error:
+                errors.append(error)
+            finally:
+                # the last parser to finish closes the stream
+                with paths_lock:
+                    running[0] -= 1
+                    if running[0] == 0:
+                        parsed.put(_DONE)
+
+        def encoder() -> None:
+            done = False
+            try:
+                while not done:
+                    item = encode_stats.get(parsed)
+                    if item is _DONE:
+                        done = True
+                        break
+                    batch = [item]
+                    while len(batch) < self.batch_size:
+                        try:
+                            item = parsed.get_nowait()
+                        except queue.Empty:
+                            break
+                        if item is _DONE:
+                            done = True
+                            break
+                        batch.append(item)
+
+                    start = time.perf_counter()
+                    if not errors:
+                        self.encode([profile for _, profile in batch])
+                    encode_stats.add(len(batch), time.perf_counter() - start)
+                    encode_stats.put(encoded, batch)
+            except BaseException as error:
+                errors.append(error)
+                # the parsers may be blocked on a full queue
+                while not done and parsed.get() is not _DONE:
+                    pass
+            finally:
+                encoded.put(_DONE)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=parser, daemon=True) for _ in range(parse_stats.workers)]
+        threads.append(threading.Thread(target=encoder, daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while (batch := sink_stats.get(encoded)) is not _DONE:
+                if errors:
+                    continue
+                batch_start = time.perf_counter()
+                self.sink(batch)
+                sink_stats.add(len(batch), time.perf_counter() - batch_start)
+        except BaseException as error:
+            errors.append(error)
+            while encoded.get() is not _DONE:
+                pass
+        finally:
+            for thread in threads:
+                thread.join()
+            if executor is not None:
+                executor.shutdown()
+            self.elapsed = time.perf_counter() - start
+
+        if errors:
+            raise errors[0]
+        return self
+
+    def report(self) -> str:
+        """Table with items, utilization, backpressure and input queue depth of each stage.
+
+        The time covers building the profiles; no thesis is ranked by the pipeline.
+        """
+        lines = [
+            f"{'etapa':<8} {'workers':>7} {'itens':>6} {'ocupação':>9} {'bloqueado (s)':>14} {'fila média':>11} {'fila máx.':>10}"
+        ]
+        for stats in self.stats:
+            utilization = stats.busy / (stats.workers * self.elapsed) if self.elapsed else 0.0
+            # the parsers read the paths directly, without an input queue
+            depth = f"{sum(stats.depths) / len(stats.depths):.1f}" if stats.depths else "-"
+            max_depth = max(stats.depths) if stats.depths else "-"
+            lines.append(
+                f"{stats.name:<8} {stats.workers:>7} {stats.items:>6} {utilization:>9.0%} "
+                f"{stats.blocked:>14.2f} {depth:>11} {max_depth:>10}"
+            )
+        lines.append(f"total: {self.elapsed:.2f}s para ler e codificar {self.stats[0].items} currículos (fila máx. {self.queue_size}); o ranking é feito depois, por consulta")
+        return "\n".join(lines)
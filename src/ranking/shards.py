@@ -0,0 +1,667 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+import hashlib
+import heapq
+import json
+import os
+import pickle
+import shutil
+import time
+from commitee.professors import Member
+from ranking.cache import ResultCache
+from ranking.engine import RankingEngine
+from ranking.pipeline import Pipeline, parse_profile
+
+# layout of the shard caches; a cache written with another layout is rebuilt
+CACHE_VERSION = 2
+
+
+class Changes(NamedTuple):
+    """HTML files of a shard that changed since its cache was written."""
+
+    added: List[str]
+    modified: List[str]
+    removed: List[str]
+    # files that could not be parsed; they keep their previous profile, if any
+    failed: Tuple[str, ...] = ()
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.modified or self.removed)
+
+
+def file_hash(path: str) -> str:
+    """SHA-1 of the content of a file."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Shard:
+    """
+    The professors of one program (a directory of Lattes HTML files), with its own
+    parsed profiles, backend, embedding index and on-disk cache.
+
+    The cache keeps the profile and the embeddings of each HTML file in files of their
+    own, and the file's size, mtime and hash in the manifest, so `refresh` only parses,
+    embeds and writes the CVs that were added or changed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        data_dir: str,
+        cache_dir: str,
+        similarity_factory: Callable[[], object],
+        max_papers: Optional[int] = 10,
+        since_year: Optional[int] = None,
+        candidates: Optional[int] = None,
+        top_k: Optional[int] = None,
+        workers: int = 4,
+        batch_size: int = 8,
+        model_fingerprint: Optional[str] = None,
+    ):
+        """
+        Args:
+            name (str): Name of the program, e.g. 'ppgcc'.
+            data_dir (str): Directory with the HTML Lattes CVs of the program.
+            cache_dir (str): Directory where this shard keeps its cache.
+            similarity_factory (Callable[[], object]): Creates the backend of this shard.
+            max_papers, since_year: Passed to LattesParser.
+            candidates, top_k: Passed to RankingEngine.
+            workers, batch_size: Parser processes and encoder micro-batch of the Pipeline.
+            model_fingerprint (Optional[str]): Version of the backend's model; a cache written
+                with another version is rebuilt.
+        """
+        self.name = name
+        self.data_dir = data_dir
+        self.cache_dir = cache_dir
+        self.similarity_factory = similarity_factory
+        self.max_papers = max_papers
+        self.since_year = since_year
+        self.candidates = candidates
+        self.top_k = top_k
+        self.workers = workers
+        self.batch_size = batch_size
+        self.model_fingerprint = model_fingerprint
+        # the pipeline of the last refresh that parsed CVs, with its stats
+        self.pipeline: Optional[Pipeline] = None
+        self.similarity = None
+        self.engine: Optional[RankingEngine] = None
+        # html file -> profile, and html file -> {"size", "mtime_ns", "sha1"}
+        self.profiles: Dict[str, Dict] = {}
+        self.files: Dict[str, Dict] = {}
+        # html file -> {"size", "mtime_ns", "error"} of the files that failed to parse;
+        # they are out of the manifest and retried once their size or mtime changes
+        self.failed: Dict[str, Dict] = {}
+
+    def options(self) -> str:
+        """Hash of the options that change the profiles; a cache with other options is rebuilt."""
+        return hashlib.sha1(repr((self.max_papers, self.since_year)).encode()).hexdigest()
+
+    def fingerprint(self) -> str:
+        """Hash of the parse options and of the content of every CV of the shard."""
+        digest = hashlib.sha1(self.options().encode())
+        for html_file in sorted(self.files):
+            digest.update(f"{html_file}:{self.files[html_file]['sha1']}".encode())
+        return digest.hexdigest()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, name)
+
+    def _row(self, kind: str, html_file: str) -> str:
+        """Cache file of one CV: 'profiles/<html>.pkl' or 'embeddings/<html>.npz'."""
+        extension = "pkl" if kind == "profiles" else "npz"
+        return self._path(os.path.join(kind, f"{html_file}.{extension}"))
+
+    def _read_manifest(self) -> Optional[Dict]:
+        try:
+            with open(self._path("manifest.json"), "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if (
+            manifest.get("version") != CACHE_VERSION
+            or manifest.get("options") != self.options()
+            or manifest.get("model") != self.model_fingerprint
+        ):
+            return None
+        return manifest
+
+    def _html_files(self) -> List[str]:
+        return sorted(f for f in os.listdir(self.data_dir) if f.endswith(".html"))
+
+    def _stat(self, html_file: str, sha1: Optional[str] = None) -> Dict:
+        path = os.path.join(self.data_dir, html_file)
+        stat = os.stat(path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": sha1 or file_hash(path)}
+
+    def changes(self) -> Changes:
+        """Compares the HTML files with the cached ones.
+
+        A file whose size and mtime did not change is not read. Otherwise its hash is
+        compared, so a file that was only touched does not count as modified. A file that
+        failed to parse is skipped until it changes again.
+        """
+        html_files = self._html_files()
+        added, modified = [], []
+        for html_file in html_files:
+            stat = os.stat(os.path.join(self.data_dir, html_file))
+            failed = self.failed.get(html_file)
+            if failed and (stat.st_size, stat.st_mtime_ns) == (failed["size"], failed["mtime_ns"]):
+                continue
+            # the failure is recorded again if the new content does not parse either
+            self.failed.pop(html_file, None)
+            cached = self.files.get(html_file)
+            if cached is None:
+                added.append(html_file)
+                continue
+            if (stat.st_size, stat.st_mtime_ns) == (cached["size"], cached["mtime_ns"]):
+                continue
+            if file_hash(os.path.join(self.data_dir, html_file)) != cached["sha1"]:
+                modified.append(html_file)
+            else:
+                cached["mtime_ns"] = stat.st_mtime_ns
+        removed = sorted(set(self.files) - set(html_files))
+        for html_file in set(self.failed) - set(html_files):
+            del self.failed[html_file]
+        return Changes(added, modified, removed)
+
+    def build(self, force: bool = False) -> "Shard":
+        """Loads the shard from its cache, or parses and embeds every CV and writes the cache.
+
+        A cache whose HTML files changed is refreshed incrementally. The whole shard is
+        only rebuilt when `force` is set, when there is no cache or when the parse options
+        changed. Other shards are never touched.
+
+        Returns:
+            Shard: self
+        """
+        manifest = None if force else self._read_manifest()
+        if manifest is None:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            os.makedirs(self.cache_dir)
+            self.profiles, self.files = {}, {}
+            self.refresh()
+            return self
+
+        self.files = manifest["files"]
+        self.profiles = {}
+        for html_file in list(self.files):
+            try:
+                with open(self._row("profiles", html_file), "rb") as file:
+                    self.profiles[html_file] = pickle.load(file)
+            except FileNotFoundError:
+                # a CV whose profile is missing is parsed again, as if it was added
+                del self.files[html_file]
+        changes = self.changes()
+        if changes:
+            self.refresh(changes)
+            return self
+
+        self.similarity = self._new_similarity(set())
+        self.engine = self._new_engine(self.similarity, self.profiles)
+        return self
+
+    def _new_similarity(self, stale: Set[str]):
+        """A new backend with the cached ANN indexes and embeddings, minus those of the `stale` professors."""
+        similarity = self.similarity_factory()
+        if hasattr(similarity, "load_embeddings"):
+            for html_file in self.files:
+                if os.path.exists(self._row("embeddings", html_file)):
+                    similarity.load_embeddings(self._row("embeddings", html_file))
+            similarity.forget(stale)
+        if self.top_k and hasattr(similarity, "load_ann") and os.path.exists(self._path("ann.professors.npz")):
+            similarity.load_ann(self._path("ann"))
+        return similarity
+
+    def _new_engine(self, similarity, profiles: Dict[str, Dict]) -> RankingEngine:
+        members = [Member(profiles[html_file]) for html_file in sorted(profiles)]
+        return RankingEngine(similarity, members, self.candidates, self.top_k)
+
+    def refresh(self, changes: Optional[Changes] = None) -> Changes:
+        """Re-parses and re-embeds only the CVs that were added, modified or removed.
+
+        The new profiles, backend and engine are built aside and then swapped in with
+        one assignment each, so a query running meanwhile uses either the old or the
+        new shard. The backend is a copy of the current one, so only the changed
+        professors are encoded, and their rows are replaced in the ANN indexes
+        (`update_ann`) instead of re-clustering them. On disk, only the files of the
+        changed CVs, the indexes and the manifest are written (`os.replace`, manifest last).
+
+        A CV that fails to parse keeps its previous profile (or stays out, if it is new)
+        and is listed in `Changes.failed`; it is retried once the file changes again.
+
+        Args:
+            changes (Optional[Changes]): The result of `changes()`, if it was already called.
+
+        Returns:
+            Changes: The files that changed; empty if the shard is up to date.
+        """
+        changes = changes or self.changes()
+        if not changes and self.engine is not None:
+            return changes
+
+        profiles = dict(self.profiles)
+        files = dict(self.files)
+        stale = {
+            self.profiles[html_file].get("lattes_id")
+            for html_file in changes.removed
+            if html_file in self.profiles
+        }
+        for html_file in changes.removed:
+            profiles.pop(html_file, None)
+            files.pop(html_file)
+        # the hash is taken before parsing, so a file written meanwhile is seen again
+        for html_file in changes.added + changes.modified:
+            files[html_file] = self._stat(html_file)
+
+        # the embeddings of the unchanged CVs are reused, from memory or from the cache
+        if self.similarity is not None and hasattr(self.similarity, "without"):
+            similarity = self.similarity.without(stale)
+        else:
+            similarity = self._new_similarity(stale)
+        # html files parsed in this refresh, and the professors whose ANN rows change
+        parsed: List[str] = []
+        affected = set(stale)
+
+        def encode(batch: List[Dict]) -> None:
+            if hasattr(similarity, "item_embeddings_batch"):
+                # an added CV may have embeddings written by an interrupted refresh
+                similarity.forget({profile.get("lattes_id") for profile in batch})
+                similarity.item_embeddings_batch(batch)
+
+        def store(batch: List[Tuple[str, Dict]]) -> None:
+            for path, profile in batch:
+                html_file = os.path.basename(path)
+                old_profile = self.profiles.get(html_file)
+                if old_profile and old_profile.get("lattes_id") != profile.get("lattes_id"):
+                    similarity.forget({old_profile.get("lattes_id")})
+                    affected.add(old_profile.get("lattes_id"))
+                affected.add(profile.get("lattes_id"))
+                parsed.append(html_file)
+                profiles[html_file] = profile
+                if hasattr(similarity, "professor_embedding"):
+                    similarity.professor_embedding(profile)
+
+        parse = partial(parse_profile, max_papers=self.max_papers, since_year=self.since_year)
+        self.pipeline = Pipeline(parse, encode, store, self.workers, self.batch_size).run(
+            os.path.join(self.data_dir, html_file) for html_file in changes.added + changes.modified
+        )
+
+        failed = []
+        for path, error in self.pipeline.failed:
+            html_file = os.path.basename(path)
+            failed.append(html_file)
+            self.failed[html_file] = {
+                "size": files[html_file]["size"],
+                "mtime_ns": files[html_file]["mtime_ns"],
+                "error": f"{type(error).__name__}: {error}",
+            }
+            if html_file in self.files:
+                files[html_file] = self.files[html_file]
+            else:
+                files.pop(html_file)
+        changes = Changes(
+            [f for f in changes.added if f not in failed],
+            [f for f in changes.modified if f not in failed],
+            changes.removed,
+            tuple(failed),
+        )
+
+        if hasattr(similarity, "item_embeddings"):
+            for profile in profiles.values():
+                similarity.item_embeddings(profile)
+        # an index that matched the previous profiles gets only the changed rows; any
+        # other is rebuilt by the engine
+        if self.top_k and hasattr(similarity, "update_ann") and similarity.ann_is_current(list(self.profiles.values())):
+            similarity.update_ann(affected, list(profiles.values()))
+        engine = self._new_engine(similarity, profiles)
+
+        self._write_cache(similarity, profiles, files, parsed, changes.removed)
+        self.profiles, self.files, self.similarity, self.engine = profiles, files, similarity, engine
+        return changes
+
+    def _write_cache(
+        self,
+        similarity,
+        profiles: Dict[str, Dict],
+        files: Dict[str, Dict],
+        changed: List[str],
+        removed: List[str],
+    ) -> None:
+        """Writes the files of the `changed` CVs, the indexes and the manifest, and then
+        deletes the files of the `removed` CVs.
+
+        Every file is written to a temporary name and then replaces the old one. A CV file
+        replaced before the manifest is harmless: the manifest still has the old size and
+        mtime of the CV, so it is parsed again.
+        """
+        os.makedirs(self._path("profiles"), exist_ok=True)
+        if hasattr(similarity, "save_embeddings"):
+            os.makedirs(self._path("embeddings"), exist_ok=True)
+
+        for html_file in changed:
+            with open(self._row("profiles", html_file) + ".tmp", "wb") as file:
+                pickle.dump(profiles[html_file], file)
+            os.replace(self._row("profiles", html_file) + ".tmp", self._row("profiles", html_file))
+            if hasattr(similarity, "save_embeddings"):
+                # np.savez adds .npz to names without it
+                similarity.save_embeddings(self._path("embeddings.tmp.npz"), {profiles[html_file].get("lattes_id")})
+                os.replace(self._path("embeddings.tmp.npz"), self._row("embeddings", html_file))
+
+        written = []
+        if self.top_k:
+            similarity.save_ann(self._path("ann.tmp"))
+            for kind in ("professors", "items"):
+                os.replace(self._path(f"ann.tmp.{kind}.npz"), self._path(f"ann.{kind}.npz.tmp"))
+                written.append(f"ann.{kind}.npz")
+        else:
+            # an index of a previous run with --ann no longer matches the profiles
+            for kind in ("professors", "items"):
+                if os.path.exists(self._path(f"ann.{kind}.npz")):
+                    os.remove(self._path(f"ann.{kind}.npz"))
+
+        manifest = {
+            "name": self.name,
+            "version": CACHE_VERSION,
+            "options": self.options(),
+            "model": self.model_fingerprint,
+            "files": files,
+        }
+        with open(self._path("manifest.json.tmp"), "w", encoding="utf-8") as file:
+            json.dump(manifest, file)
+        written.append("manifest.json")
+
+        for name in written:
+            os.replace(self._path(name + ".tmp"), self._path(name))
+
+        for html_file in removed:
+            for kind in ("profiles", "embeddings"):
+                if os.path.exists(self._row(kind, html_file)):
+                    os.remove(self._row(kind, html_file))
+
+    def rank(self, theme: str, summary: str) -> List[Tuple[Member, float]]:
+        return self.engine.rank(theme, summary)
+
+
+def backend_factory(model: str, stemming: bool = False) -> Tuple[Callable[[], object], str, str]:
+    """Factory of the backend of a model name, the name used for it in cache paths and
+    the fingerprint of its version (see model_fingerprint), used in cache keys.
+
+    'tf-idf' and 'bm25' are the lexical backends; any other name is a SentenceTransformer
+    model, loaded once and shared by the instances of every shard.
+    """
+    if model == "tf-idf":
+        from embedding.tfidf import TFIDFSimilarity
+        return TFIDFSimilarity, model, model
+    if model == "bm25":
+        from embedding.bm25 import BM25Similarity
+        backend = model + ("-stem" if stemming else "")
+        return partial(BM25Similarity, stemming=stemming), backend, backend
+
+    from similarity.similarity import SentenceTransformerSimilarity
+    loaded = SentenceTransformerSimilarity(model)
+    return (
+        partial(SentenceTransformerSimilarity, model, loaded.model, loaded.model_fingerprint),
+        model,
+        loaded.model_fingerprint,
+    )
+
+
+class CorpusRegistry:
+    """
+    Registry of program corpora: each subdirectory of `data_root` with HTML files is a shard.
+
+    Queries fan out over the selected shards in parallel and the per-shard rankings
+    are merged into a global ranking.
+    """
+
+    def __init__(
+        self,
+        data_root: str,
+        cache_root: str,
+        similarity_factory: Callable[[], object],
+        backend: str,
+        max_papers: Optional[int] = 10,
+        since_year: Optional[int] = None,
+        candidates: Optional[int] = None,
+        top_k: Optional[int] = None,
+        result_cache: Optional[ResultCache] = None,
+        workers: int = 4,
+        batch_size: int = 8,
+        model_fingerprint: Optional[str] = None,
+    ):
+        """
+        Args:
+            data_root (str): Directory with one subdirectory per program, e.g. '../data'.
+            cache_root (str): Directory of the shard caches, one subdirectory per program and backend.
+            similarity_factory (Callable[[], object]): Creates the backend of a shard. Backends
+                may share a loaded model, but each shard has its own instances.
+            backend (str): Name of the backend (model name), used in the cache path.
+            max_papers, since_year: Passed to LattesParser.
+            candidates, top_k: Passed to each shard's RankingEngine.
+            result_cache (Optional[ResultCache]): Cache of the merged rankings.
+            workers, batch_size: Parser processes and encoder micro-batch used to build the shards.
+            model_fingerprint (Optional[str]): Version of the model (see `backend_factory`),
+                kept in the shard manifests and in the result cache keys. Defaults to `backend`.
+        """
+        self.data_root = data_root
+        self.cache_root = cache_root
+        self.similarity_factory = similarity_factory
+        self.backend = backend
+        self.options = dict(
+            max_papers=max_papers,
+            since_year=since_year,
+            candidates=candidates,
+            top_k=top_k,
+            workers=workers,
+            batch_size=batch_size,
+        )
+        self.model_fingerprint = model_fingerprint or backend
+        self.result_cache = result_cache
+        self.shards: Dict[str, Shard] = {}
+
+    def programs(self) -> List[str]:
+        """Names of the subdirectories of `data_root` that have Lattes HTML files."""
+        return sorted(
+            name
+            for name in os.listdir(self.data_root)
+            if os.path.isdir(os.path.join(self.data_root, name))
+            and any(f.endswith(".html") for f in os.listdir(os.path.join(self.data_root, name)))
+        )
+
+    def _new_shard(self, name: str) -> Shard:
+        return Shard(
+            name,
+            os.path.join(self.data_root, name),
+            os.path.join(self.cache_root, name, self.backend.replace("/", "_")),
+            self.similarity_factory,
+            **self.options,
+            model_fingerprint=self.model_fingerprint,
+        )
+
+    def shard(self, name: str) -> Shard:
+        """The shard of a program, built (or loaded from its cache) on first use."""
+        if name not in self.shards:
+            self.shards[name] = self._new_shard(name).build()
+        return self.shards[name]
+
+    def rebuild(self, name: str) -> Shard:
+        """Rebuilds one shard from the HTML files, ignoring its cache. Other shards are kept."""
+        self.shards[name] = self._new_shard(name).build(force=True)
+        return self.shards[name]
+
+    def refresh(self, programs: Optional[List[str]] = None) -> Dict[str, Changes]:
+        """Refreshes the loaded shards (or the given programs) with the changed HTML files.
+
+        Returns:
+            Dict[str, Changes]: The changes of each program that had any, including CVs
+                that failed to parse.
+        """
+        changed = {}
+        for name in programs or list(self.shards):
+            if name not in self.shards:
+                self.shard(name)
+                continue
+            changes = self.shards[name].refresh()
+            if changes or changes.failed:
+                changed[name] = changes
+        return changed
+
+    def watch(self, programs: Optional[List[str]] = None, interval: float = 2.0) -> Iterator[Dict[str, Changes]]:
+        """Polls the HTML files of the programs every `interval` seconds.
+
+        Yields:
+            Dict[str, Changes]: The changes of each program, every time a CV is added,
+                modified or removed. The shards are already refreshed when it is yielded.
+        """
+        while True:
+            time.sleep(interval)
+            changed = self.refresh(programs)
+            if changed:
+                yield changed
+
+    def fingerprint(self, programs: List[str]) -> str:
+        """Hash of the CVs of the programs; it changes whenever one of them is refreshed."""
+        digest = hashlib.sha1()
+        for name in sorted(programs):
+            digest.update(f"{name}:{self.shard(name).fingerprint()}".encode())
+        return digest.hexdigest()
+
+    def rank(
+        self, theme: str, summary: str, programs: Optional[List[str]] = None, k: Optional[int] = None
+    ) -> List[Tuple[Member, float]]:
+        """Ranks a thesis on several shards in parallel and merges the results.
+
+        Args:
+            theme (str): Title of the thesis.
+            summary (str): Summary of the thesis.
+            programs (Optional[List[str]]): Shards to be queried. Defaults to all programs.
+            k (Optional[int]): Size of the global ranking. Defaults to every professor.
+
+        Returns:
+            List[Tuple[Member, float]]: The global ranking, best score first. A professor in
+                several programs appears once, with the best score.
+
+        Note:
+            Cosine scores (SentenceTransformer) are comparable across shards; the lexical
+            backends use the statistics of each shard, so their merged order is approximate.
+        """
+        return self.rank_batch([(theme, summary)], programs, k)[0]
+
+    def rank_batch(
+        self, queries: List[Tuple[str, str]], programs: Optional[List[str]] = None, k: Optional[int] = None
+    ) -> List[List[Tuple[Member, float]]]:
+        """Ranks a micro-batch of (theme, summary) queries, like `rank`.
+
+        Queries found in the result cache are not sent to the shards; the others are
+        ranked by each shard in one `rank_batch` call. With a dense backend they are
+        encoded once here and every shard scores the same embeddings; the lexical
+        backends tokenize them per shard.
+
+        Returns:
+            List[List[Tuple[Member, float]]]: One global ranking per query.
+
+        Raises:
+            ValueError: If no program is given and `data_root` has none.
+        """
+        programs = programs or self.programs()
+        if not programs:
+            raise ValueError(f"No program with Lattes HTML files in {self.data_root}")
+        shards = [self.shard(name) for name in programs]
+        rankings: List[Optional[List[Tuple[Member, float]]]] = [None] * len(queries)
+
+        keys = [None] * len(queries)
+        if self.result_cache is not None:
+            fingerprint = self.fingerprint(programs)
+            for i, (theme, summary) in enumerate(queries):
+                keys[i] = self.result_cache.key(
+                    theme,
+                    summary,
+                    self.model_fingerprint,
+                    getattr(shards[0].similarity, "field_weights", None),
+                    fingerprint,
+                    candidates=self.options["candidates"],
+                    top_k=self.options["top_k"],
+                    k=k,
+                )
+                cached = self.result_cache.get(keys[i])
+                if cached is not None:
+                    rankings[i] = [
+                        (self.shards[program].engine.member(lattes_id), score)
+                        for program, lattes_id, score in cached
+                    ]
+
+        pending = [i for i, ranking in enumerate(rankings) if ranking is None]
+        if not pending:
+            return rankings
+
+        pending_queries = [queries[i] for i in pending]
+        embeddings = None
+        if hasattr(shards[0].similarity, "query_embeddings"):
+            embeddings = shards[0].similarity.query_embeddings(pending_queries)
+
+        with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+            shard_rankings = list(executor.map(
+                lambda shard: shard.engine.rank_batch(pending_queries, embeddings), shards
+            ))
+
+        for position, i in enumerate(pending):
+            merged = []
+            seen = set()
+            per_shard = [
+                [(member, score, shard.name) for member, score in batch[position]]
+                for shard, batch in zip(shards, shard_rankings)
+            ]
+            for member, score, program in heapq.merge(*per_shard, key=lambda x: -x[1]):
+                if member.lattes_id in seen:
+                    continue
+                seen.add(member.lattes_id)
+                merged.append((member, score, program))
+                if k and len(merged) == k:
+                    break
+
+            if keys[i] is not None:
+                self.result_cache.put(keys[i], [(program, member.lattes_id, score) for member, score, program in merged])
+            rankings[i] = [(member, score) for member, score, _ in merged]
+        return rankings
+
+    def explain(
+        self,
+        theme: str,
+        summary: str,
+        ranking: List[Tuple[Member, float]],
+        top_k: int = 5,
+        top_n: int = 3,
+    ) -> List[Tuple[Member, float, Dict[str, List[Tuple[str, float]]]]]:
+        """Explains the top-k of a merged ranking, like RankingEngine.explain.
+
+        The members are grouped by the shard that has them, so each engine explains
+        its members in one call. A dense backend encodes the query at most once.
+        """
+        groups: Dict[int, Tuple[RankingEngine, List[Tuple[Member, float]]]] = {}
+        for member, score in ranking[:top_k]:
+            engine = self.engine_of(member)
+            groups.setdefault(id(engine), (engine, []))[1].append((member, score))
+
+        engines = [engine for engine, _ in groups.values()]
+        if engines and hasattr(engines[0].similarity, "query_embedding"):
+            embedding = engines[0].similarity.query_embedding(theme, summary)
+            for engine in engines[1:]:
+                engine.similarity.use_query_embeddings([(theme, summary)], [embedding])
+
+        explained = {}
+        for engine, members in groups.values():
+            for member, score, explanation in engine.explain(theme, summary, members, len(members), top_n):
+                explained[id(member)] = (member, score, explanation)
+        return [explained[id(member)] for member, _ in ranking[:top_k]]
+
+    def engine_of(self, member: Member) -> RankingEngine:
+        """Engine of the loaded shard that has the member."""
+        for shard in self.shards.values():
+            if member in shard.engine.members:
+                return shard.engine
+        raise KeyError(f"{member.name} is not in any loaded shard")
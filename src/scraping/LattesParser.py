@@ -1,8 +1,72 @@
-from typing import Dict, Tuple, List
+from typing import Any, Callable, Dict, Tuple, List, Optional, Union
 import re
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Tag
 import os
 from pprint import pprint, pformat
+from scraping.publication import Publication, parse_reference, select_latest
+from scraping.slicer import SlicedHTML, slice_lattes
+
+# classes of the divs that open a new (sub)section in the 'Produções' block
+SECTION_BOUNDARY_CLASSES = {"cita-artigos", "inst_back", "title-wrapper"}
+
+
+class LazyInfo(dict):
+    """
+    Dictionary whose values are computed by a loader the first time they are read.
+
+    A loader may fill several keys at once, e.g. ('name', 'lattes_id').
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._loaders: Dict[str, Tuple[Tuple[str, ...], Callable[[], Any]]] = {}
+
+    def add_loader(
+        self, keys: Union[str, Tuple[str, ...]], loader: Callable[[], Any]
+    ) -> None:
+        """Registers the function that computes `keys`.
+
+        Args:
+            keys (Union[str, Tuple[str, ...]]): A key, or a tuple of keys if the loader returns a tuple.
+            loader (Callable[[], Any]): Function without arguments that returns the value(s).
+        """
+        keys = (keys,) if isinstance(keys, str) else tuple(keys)
+        for key in keys:
+            self._loaders[key] = (keys, loader)
+
+    def __missing__(self, key: str) -> Any:
+        keys, loader = self._loaders[key]
+        values = loader()
+        if len(keys) == 1:
+            values = (values,)
+        for k, v in zip(keys, values):
+            super().__setitem__(k, v)
+        return super().__getitem__(key)
+
+    def __contains__(self, key: object) -> bool:
+        return super().__contains__(key) or key in self._loaders
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def keys(self):
+        return list(dict.fromkeys([*super().keys(), *self._loaders]))
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def loaded(self) -> List[str]:
+        """Keys that were already computed."""
+        return list(super().keys())
 
 
 class LattesParser:
@@ -10,14 +74,29 @@ class LattesParser:
     Parses a HTML file of a Lattes CV to extract key information
     """
 
-    def __init__(self, filename: str):
+    def __init__(
+        self,
+        filename: str,
+        max_papers: Optional[int] = 10,
+        since_year: Optional[int] = None,
+        pre_slice: bool = True,
+    ):
         """Initializes the LattesParser.
 
         Args:
             filename (str): The file path to the HTML Lattes CV.
+            max_papers (Optional[int]): Number of latest papers kept in 'periodic_papers' and
+                'congress_papers'. None keeps the whole history.
+            since_year (Optional[int]): Only papers published from this year on are kept.
+            pre_slice (bool): Parses only the sections used here, cut out of the raw file
+                with `slice_lattes`, instead of the whole HTML.
         """
 
         self.filename = filename
+        self.max_papers = max_papers
+        self.since_year = since_year
+        self.pre_slice = pre_slice
+        self.sliced: Optional[SlicedHTML] = None
         self.soup = self._load_html()
         self.info: Dict = {}
         self._extract_information()
@@ -26,10 +105,17 @@ class LattesParser:
         """Loads and parses the HTML file into a BeautifulSoap object.
 
         Uses 'latin-1' encoding because there are portuguese texts.
+        With `pre_slice`, only the fragments found by `slice_lattes` are parsed; if the
+        file does not have the expected layout, the whole file is parsed.
 
         Returns:
             BeautifulSoup: _description_
         """
+        if self.pre_slice:
+            self.sliced = slice_lattes(self.filename)
+            if self.sliced is not None:
+                return BeautifulSoup(self.sliced.to_html(), "html.parser")
+
         with open(self.filename, encoding="latin-1") as fp:
             return BeautifulSoup(fp, "html.parser")
 
@@ -131,40 +217,40 @@ class LattesParser:
             )
             return []
 
-    def _get_periodicals_papers(self) -> List[str]:
-        """
-        Extracts the titles of the 10 latest periodical papers from the HTML document
+    def _get_periodicals_records(self) -> List[Publication]:
+        """Extracts every periodical paper from the 'artigos-completos' section.
 
         Returns:
-            List[str]: a list of up to 10 paper titles.
+            List[Publication]: The full periodical history, in document order.
         """
 
         periodicals_div = self.soup.find("div", id="artigos-completos")
-        # 10 latest papers
-        papers = periodicals_div.findAll("span", class_="transform")[:10]
-
-        titles = []
-        for paper in papers:
-            paper_text: str = paper.get_text(strip=True)
-            last_part: str = paper_text.split(";")[-1]
-
-            authors_title = last_part[last_part.find(".") : -1]
+        if periodicals_div is None:
+            return []
 
-            authors_title_split = authors_title.split(".")
+        records = []
+        for entry in periodicals_div.find_all("div", class_="artigo-completo"):
+            paper = entry.find("span", class_="transform")
+            if paper is None:
+                continue
 
-            for i in range(0, len(authors_title_split)):
-                if len(authors_title_split[i]) > 3:
-                    title = authors_title_split[i]
-                    break
-            titles.append(title)
-        return titles
+            # the year is exposed in a hidden span used by the page to sort the papers
+            year_span = paper.find(
+                "span", class_="informacao-artigo", attrs={"data-tipo-ordenacao": "ano"}
+            )
+            year_text = year_span.get_text(strip=True) if year_span else ""
+            year = int(year_text) if year_text.isdigit() else None
 
-    def _get_congress_papers(self) -> List[str]:
-        """Extracts the titles of the 10 latest congress papers from the HTML document.
+            record = parse_reference(self._reference_text(paper), year)
+            if record is not None:
+                records.append(record)
+        return records
 
+    def _get_congress_records(self) -> List[Publication]:
+        """Extracts every paper from the 'Trabalhos completos publicados em anais de congressos' section.
 
         Returns:
-            List[str]: a list of up to 10 paper titles
+            List[Publication]: The full congress history, in document order.
         """
 
         congress_link = self.soup.find(
@@ -174,54 +260,63 @@ class LattesParser:
         if congress_link is None:
             return []
 
-        papers = congress_link.find_all_next(name="span", attrs={"class": "transform"})[
-            :10
-        ]
-
-        titles = []
-
-        for paper in papers:
-            paper_text: str = paper.get_text(strip=True)
-            last_part: str = paper_text.split(";")[-1]
-
-            authors_title = last_part[last_part.find(".") : -1]
-
-            if len(authors_title) == 0:
+        records = []
+        for element in congress_link.next_elements:
+            if not isinstance(element, Tag):
                 continue
-            authors_title_split = authors_title.split(".")
-            for i in range(0, len(authors_title_split)):
-                if len(authors_title_split[i]) > 3:
-                    title = authors_title_split[i]
-                    break
-            titles.append(title)
 
-        return titles
+            # the section ends at the next sub title (e.g. 'Resumos expandidos') or block
+            if element.name == "div" and SECTION_BOUNDARY_CLASSES.intersection(
+                element.get("class") or []
+            ):
+                break
+
+            if element.name == "span" and "transform" in (element.get("class") or []):
+                record = parse_reference(self._reference_text(element))
+                if record is not None:
+                    records.append(record)
+        return records
+
+    @staticmethod
+    def _reference_text(paper: Tag) -> str:
+        """Gets the text of a reference, skipping the hidden spans used for sorting."""
+        return "".join(
+            text
+            for text in paper.find_all(string=True)
+            if "informacao-artigo" not in (text.parent.get("class") or [])
+        )
+
+    def _latest_titles(self, records: List[Publication]) -> List[str]:
+        """Titles of the latest records according to `max_papers` and `since_year`."""
+        latest = select_latest(records, self.max_papers, self.since_year)
+        return [record.title for record in latest]
 
     def _extract_information(self) -> None:
-        """Extract and store all relevant info in self.info.
+        """Register the loaders of every section in self.info.
+
+        Nothing is extracted here: each section is read from the parsed HTML the first time
+        it is read from the dictionary.
 
         Side Effects:
-            Populates `self.info` with keys: 'name', 'lattes_id', 'research_areas', 'research_areas','periodic papers', 'congress papers' and 'projects'
+            Populates `self.info` with keys: 'name', 'lattes_id', 'research_areas', 'periodic_papers',
+            'congress_papers', 'projects', 'periodic_records' and 'congress_records'
         """
 
-        name, lattes_id_lattes = self._get_personal_info()
-
-        areas = self._get_research_areas()
-
-        periodic = self._get_periodicals_papers()
+        info = LazyInfo()
 
-        congress = self._get_congress_papers()
-
-        projects = self._get_research_projects()
+        info.add_loader(("name", "lattes_id"), self._get_personal_info)
+        info.add_loader("research_areas", self._get_research_areas)
+        info.add_loader("periodic_records", self._get_periodicals_records)
+        info.add_loader("congress_records", self._get_congress_records)
+        info.add_loader(
+            "periodic_papers", lambda: self._latest_titles(info["periodic_records"])
+        )
+        info.add_loader(
+            "congress_papers", lambda: self._latest_titles(info["congress_records"])
+        )
+        info.add_loader("projects", self._get_research_projects)
 
-        self.info = {
-            "name": name,
-            "lattes_id": lattes_id_lattes,
-            "research_areas": areas,
-            "periodic_papers": periodic,
-            "congress_papers": congress,
-            "projects": projects,
-        }
+        self.info = info
 
     def get_info(self) -> Dict:
         """
@@ -245,17 +340,25 @@ class LattesParser:
                         # List of declared research areas.
 
                     "periodic_papers": List[str],
-                        # Titles of papers published in academic journals or periodicals.
+                        # Titles of the latest papers published in academic journals or periodicals.
 
                     "congress_papers": List[str],
-                        # Titles of papers presented at academic conferences or congresses.
+                        # Titles of the latest papers presented at academic conferences or congresses.
 
-                    "projects": List[str]
+                    "projects": List[str],
                         # Titles or descriptions of research projects the person participates in.
+
+                    "periodic_records": List[Publication],
+                        # Whole periodical history with title, year, venue and authors.
+
+                    "congress_records": List[Publication]
+                        # Whole congress history with title, year, venue and authors.
                 }
 
         Notes:
-            - The dictionary is only available after `_extract_information()` has been executed.
+            - The dictionary is a `LazyInfo`: each section is only extracted when it is first read.
+              The HTML is parsed by the constructor, whichever sections are read.
+            - The latest papers are selected by year, using `max_papers` and `since_year`.
             - If the extraction process failed or was incomplete, some fields may be empty lists or `None`.
         """
         return self.info
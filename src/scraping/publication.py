@@ -0,0 +1,98 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+import re
+
+# Lattes separates the author list from the rest of the reference with " . ",
+# or with ".. "/". " when there is a single author (e.g. "DIAS, M.A.. Title")
+AUTHORS_SEPARATORS = (" . ", ".. ", ". ")
+
+YEAR_PATTERN = re.compile(r"\b(19\d{2}|20\d{2})\b")
+
+
+@dataclass
+class Publication:
+    """A single bibliographic entry from a Lattes CV."""
+
+    title: str
+    year: Optional[int] = None
+    venue: str = ""
+    authors: List[str] = field(default_factory=list)
+
+
+def parse_reference(text: str, year: Optional[int] = None) -> Optional[Publication]:
+    """Splits a Lattes reference string into a Publication.
+
+    References follow the pattern ``AUTHORS . Title. Venue, ..., YEAR.`` for
+    periodicals and ``AUTHORS . Title. In: Event, YEAR, City. ...`` for
+    congress papers.
+
+    Args:
+        text (str): The reference text, without the hidden sorting spans.
+        year (Optional[int]): Publication year, when the HTML exposes it
+            explicitly. Otherwise it is taken from the venue part of the text.
+
+    Returns:
+        Optional[Publication]: The parsed entry, or None if no title was found.
+    """
+    text = " ".join(text.split())
+
+    authors = []
+    rest = text
+    for separator in AUTHORS_SEPARATORS:
+        split_at = text.find(separator)
+        if split_at != -1:
+            # keeps the initial's dot in "DIAS, M.A.. Title"
+            author_part = text[: split_at + (1 if separator == ".. " else 0)]
+            authors = [a.strip() for a in author_part.split(";") if a.strip()]
+            rest = text[split_at + len(separator):].lstrip(". ")
+            break
+
+    if " In: " in rest:
+        title, venue_part = rest.split(" In: ", 1)
+    else:
+        title, _, venue_part = rest.partition(". ")
+
+    title = title.strip().rstrip(".").strip()
+    if len(title) <= 3:
+        return None
+
+    venue = venue_part.split(",")[0].strip().rstrip(".")
+
+    if year is None:
+        match = YEAR_PATTERN.search(venue_part) or YEAR_PATTERN.search(title)
+        if match:
+            year = int(match.group(1))
+
+    return Publication(title=title, year=year, venue=venue, authors=authors)
+
+
+def select_latest(
+    publications: List[Publication],
+    max_items: Optional[int] = 10,
+    since_year: Optional[int] = None,
+) -> List[Publication]:
+    """Selects the most recent publications by year.
+
+    Entries without a year are kept after the dated ones, in document order.
+
+    Args:
+        publications (List[Publication]): The full publication history.
+        max_items (Optional[int]): Maximum number of entries to keep. None keeps all.
+        since_year (Optional[int]): Drops entries published before this year.
+
+    Returns:
+        List[Publication]: The selected entries, newest first.
+    """
+    if since_year is not None:
+        publications = [
+            p for p in publications if p.year is not None and p.year >= since_year
+        ]
+
+    # sorted is stable, so entries from the same year keep the CV order
+    latest = sorted(
+        publications, key=lambda p: p.year if p.year is not None else -1, reverse=True
+    )
+
+    if max_items is not None:
+        latest = latest[:max_items]
+    return latest
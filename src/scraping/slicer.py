@@ -0,0 +1,169 @@
+from typing import Dict, Optional, Tuple
+import mmap
+import os
+import time
+
+# markers that open a new block in the Lattes HTML; a section ends at the next one of them
+TITLE_WRAPPER = b'<div class="title-wrapper"'
+SUB_TITLE = b'<div class="cita-artigos"'
+BLOCK_TITLE = b'<div class="inst_back"'
+
+# tag used to wrap each fragment, so an unclosed div cannot swallow the next fragment
+FRAGMENT_TAG = "section"
+
+
+class SlicedHTML:
+    """
+    The fragments of a Lattes HTML file that are used by LattesParser.
+    """
+
+    def __init__(self, fragments: Dict[str, Tuple[int, int, str]], total_bytes: int):
+        """
+        Args:
+            fragments (Dict[str, Tuple[int, int, str]]): Section name -> (start, end, decoded text),
+                with start and end as byte offsets in the original file.
+            total_bytes (int): Size of the original file.
+        """
+        self.fragments = fragments
+        self.total_bytes = total_bytes
+
+    @property
+    def sliced_bytes(self) -> int:
+        return sum(end - start for start, end, _ in self.fragments.values())
+
+    @property
+    def skipped_bytes(self) -> int:
+        return self.total_bytes - self.sliced_bytes
+
+    def to_html(self) -> str:
+        """Joins the fragments, in document order, in a document for BeautifulSoup."""
+        ordered = sorted(self.fragments.items(), key=lambda item: item[1][0])
+        return "".join(
+            f'<{FRAGMENT_TAG} data-section="{name}">{text}</{FRAGMENT_TAG}>'
+            for name, (_, _, text) in ordered
+        )
+
+
+def _next_boundary(data: mmap.mmap, start: int, markers: Tuple[bytes, ...]) -> int:
+    """Offset of the first marker after `start`, or the end of the file."""
+    found = [pos for pos in (data.find(marker, start) for marker in markers) if pos != -1]
+    return min(found) if found else len(data)
+
+
+def _find_sections(data: mmap.mmap) -> Optional[Dict[str, Tuple[int, int]]]:
+    """Finds the byte ranges of the sections read by LattesParser.
+
+    Returns:
+        Optional[Dict[str, Tuple[int, int]]]: Section name -> (start, end). Missing sections
+            are left out. None if a section anchor was found without the marker that starts
+            it, since the layout is not the expected one.
+    """
+    sections = {}
+
+    personal = data.find(b'<div class="infpessoa"')
+    if personal != -1:
+        sections["infpessoa"] = (personal, _next_boundary(data, personal, (TITLE_WRAPPER,)))
+
+    # 'Linhas de pesquisa' and 'Projetos de pesquisa' are whole title-wrapper blocks
+    for name in ("LinhaPesquisa", "ProjetosPesquisa"):
+        anchor = data.find(b'<a name="' + name.encode() + b'"')
+        if anchor == -1:
+            continue
+        start = data.rfind(TITLE_WRAPPER, 0, anchor)
+        if start == -1:
+            return None
+        sections[name] = (start, _next_boundary(data, anchor, (TITLE_WRAPPER,)))
+
+    # the periodicals div starts with its own sub title, so the search skips it
+    periodicals = data.find(b'<div id="artigos-completos"')
+    if periodicals != -1:
+        title = data.find(SUB_TITLE, periodicals)
+        if title == -1:
+            return None
+        after_title = title + len(SUB_TITLE)
+        sections["artigos-completos"] = (
+            periodicals,
+            _next_boundary(data, after_title, (SUB_TITLE, BLOCK_TITLE, TITLE_WRAPPER)),
+        )
+
+    congress = data.find(b'<a name="TrabalhosPublicadosAnaisCongresso"')
+    if congress != -1:
+        start = data.rfind(SUB_TITLE, 0, congress)
+        if start == -1:
+            return None
+        sections["TrabalhosPublicadosAnaisCongresso"] = (
+            start,
+            _next_boundary(data, congress, (SUB_TITLE, BLOCK_TITLE, TITLE_WRAPPER)),
+        )
+
+    return sections
+
+
+def slice_lattes(filename: str) -> Optional[SlicedHTML]:
+    """Memory-maps a Lattes HTML file and cuts out the sections used by LattesParser.
+
+    Only byte searches are done over the raw file; the selected fragments are the
+    only part decoded (as latin-1) and handed to the HTML parser.
+
+    Args:
+        filename (str): The file path to the HTML Lattes CV.
+
+    Returns:
+        Optional[SlicedHTML]: The fragments, or None if the file is empty or the 'infpessoa'
+            block or the start of an anchored section was not found, and the file has to be
+            parsed as a whole.
+    """
+    with open(filename, "rb") as fp:
+        try:
+            data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file cannot be mapped
+            return None
+        with data:
+            sections = _find_sections(data)
+            if sections is None or "infpessoa" not in sections:
+                return None
+
+            fragments = {
+                name: (start, end, data[start:end].decode("latin-1"))
+                for name, (start, end) in sections.items()
+            }
+            return SlicedHTML(fragments, len(data))
+
+
+def benchmark(data_dir: str) -> None:
+    """Compares the parse time of whole files and of pre-sliced files over a corpus."""
+    from scraping.LattesParser import LattesParser
+
+    html_files = sorted(f for f in os.listdir(data_dir) if f.endswith(".html"))
+
+    total_bytes = skipped_bytes = 0
+    full_time = sliced_time = 0.0
+    for html_file in html_files:
+        file_path = os.path.join(data_dir, html_file)
+
+        start = time.perf_counter()
+        full = LattesParser(file_path, pre_slice=False)
+        full_info = dict(full.get_info())
+        full_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        sliced = LattesParser(file_path, pre_slice=True)
+        sliced_info = dict(sliced.get_info())
+        sliced_time += time.perf_counter() - start
+
+        if full_info != sliced_info:
+            print(f"   ! {html_file}: pre-sliced parse differs from the full parse")
+
+        total_bytes += os.path.getsize(file_path)
+        if sliced.sliced is not None:
+            skipped_bytes += sliced.sliced.skipped_bytes
+
+    print(f"Files: {len(html_files)}")
+    print(f"Bytes skipped: {skipped_bytes} of {total_bytes} ({skipped_bytes / total_bytes:.1%})")
+    print(f"Full parse: {full_time:.2f}s | pre-sliced parse: {sliced_time:.2f}s")
+    print(f"Parse time reduction: {1 - sliced_time / full_time:.1%}")
+
+
+if __name__ == "__main__":
+    benchmark("../data/ppgcc")
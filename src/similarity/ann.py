@@ -0,0 +1,261 @@
+from typing import Callable, Hashable, List, Optional, Tuple
+import argparse
+import json
+import time
+import numpy as np
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scales each row to unit length, so the dot product is the cosine similarity."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def spherical_kmeans(
+    vectors: np.ndarray, k: int, iterations: int = 20, seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Clusters unit vectors by cosine similarity.
+
+    Args:
+        vectors (np.ndarray): Matrix (n, dim) of unit vectors.
+        k (int): Number of clusters.
+        iterations (int): Maximum number of assignment/update rounds.
+        seed (int): Seed of the initial centroids.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The centroids (k, dim) and the cluster of each vector (n,).
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    assignment = np.full(len(vectors), -1)
+
+    for _ in range(iterations):
+        new_assignment = np.argmax(vectors @ centroids.T, axis=1)
+        if np.array_equal(new_assignment, assignment):
+            break
+        assignment = new_assignment
+
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = np.bincount(assignment, minlength=k) == 0
+        # an empty cluster restarts from a random vector
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize(sums)
+
+    return centroids, assignment
+
+
+class IVFIndex:
+    """
+    Approximate nearest neighbour index (inverted file) for cosine similarity.
+
+    The vectors are clustered with k-means; a query is only compared with the
+    vectors of the `n_probe` clusters whose centroids are closest to it.
+    """
+
+    def __init__(self, n_lists: Optional[int] = None, n_probe: int = 4):
+        """
+        Args:
+            n_lists (Optional[int]): Number of clusters. Defaults to sqrt(n) when built.
+            n_probe (int): Number of clusters visited per query.
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.centroids = np.zeros((0, 0))
+        # vectors sorted by cluster; the cluster i is vectors[offsets[i]:offsets[i + 1]]
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.labels: List[Hashable] = []
+        # identifies what was indexed (e.g. model and corpus), checked before reusing a saved index
+        self.fingerprint = ""
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def build(self, vectors: np.ndarray, labels: List[Hashable], seed: int = 0) -> "IVFIndex":
+        """Clusters the vectors and stores them by cluster.
+
+        Args:
+            vectors (np.ndarray): Matrix (n, dim) of embeddings.
+            labels (List[Hashable]): What `top_k` returns for each vector (JSON serializable).
+            seed (int): Seed of k-means.
+
+        Returns:
+            IVFIndex: self
+        """
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        n_lists = min(self.n_lists or max(1, int(np.sqrt(len(vectors)))), len(vectors))
+        self.centroids, assignment = spherical_kmeans(vectors, n_lists, seed=seed)
+        self._store(vectors, labels, assignment)
+        self.n_lists = n_lists
+        return self
+
+    def _lists(self) -> np.ndarray:
+        """The cluster of each stored vector."""
+        return np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+
+    def _store(self, vectors: np.ndarray, labels: List[Hashable], lists: np.ndarray) -> None:
+        # new arrays are assigned, never written in place, so a copy.copy of the index is
+        # not affected
+        order = np.argsort(lists, kind="stable")
+        self.vectors = vectors[order]
+        self.labels = [labels[i] for i in order]
+        self.offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(lists, minlength=len(self.centroids)))]
+        )
+
+    def remove(self, predicate: Callable[[Hashable], bool]) -> "IVFIndex":
+        """Removes the vectors whose label matches a predicate. The centroids are kept.
+
+        Returns:
+            IVFIndex: self
+        """
+        keep = np.array([not predicate(label) for label in self.labels], dtype=bool)
+        self._store(
+            self.vectors[keep],
+            [label for label, kept in zip(self.labels, keep) if kept],
+            self._lists()[keep],
+        )
+        return self
+
+    def add(self, vectors: np.ndarray, labels: List[Hashable]) -> "IVFIndex":
+        """Inserts vectors into the list of their closest centroid, without re-running k-means.
+
+        The centroids are those of the last `build`, so after many updates the lists may
+        be unbalanced and the index is better rebuilt. An empty index is built.
+
+        Returns:
+            IVFIndex: self
+        """
+        if not len(labels):
+            return self
+        if not len(self.centroids):
+            return self.build(vectors, labels)
+
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        self._store(
+            np.concatenate([self.vectors, vectors]),
+            self.labels + list(labels),
+            np.concatenate([self._lists(), np.argmax(vectors @ self.centroids.T, axis=1)]),
+        )
+        return self
+
+    def top_k(
+        self, query: np.ndarray, k: int, n_probe: Optional[int] = None
+    ) -> List[Tuple[Hashable, float]]:
+        """Approximate k most similar vectors to a query.
+
+        Args:
+            query (np.ndarray): Vector (dim,).
+            k (int): Number of results.
+            n_probe (Optional[int]): Overrides the number of clusters visited.
+
+        Returns:
+            List[Tuple[Hashable, float]]: (label, cosine similarity), best first.
+        """
+        if not self.labels:
+            return []
+        query = normalize(np.asarray(query, dtype=np.float32))
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+
+        lists = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+        positions = np.concatenate(
+            [np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists]
+        )
+        if len(positions) == 0:
+            return []
+
+        scores = self.vectors[positions] @ query
+        k = min(k, len(positions))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(self.labels[positions[i]], float(scores[i])) for i in best]
+
+    def exact_top_k(self, query: np.ndarray, k: int) -> List[Tuple[Hashable, float]]:
+        """The exact k most similar vectors (brute force), for comparison."""
+        if not self.labels:
+            return []
+        scores = self.vectors @ normalize(np.asarray(query, dtype=np.float32))
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(self.labels[i], float(scores[i])) for i in best]
+
+    def save(self, path: str) -> None:
+        """Saves the index to a .npz file."""
+        np.savez(
+            path,
+            centroids=self.centroids,
+            vectors=self.vectors,
+            offsets=self.offsets,
+            labels=np.array(json.dumps(self.labels)),
+            n_probe=np.array(self.n_probe),
+            fingerprint=np.array(self.fingerprint),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        """Loads an index saved by `save`. Tuple labels come back as tuples."""
+        with np.load(path) as data:
+            index = cls(n_lists=len(data["centroids"]), n_probe=int(data["n_probe"]))
+            index.centroids = data["centroids"]
+            index.vectors = data["vectors"]
+            index.offsets = data["offsets"]
+            index.labels = [
+                tuple(label) if isinstance(label, list) else label
+                for label in json.loads(str(data["labels"]))
+            ]
+            index.fingerprint = str(data["fingerprint"]) if "fingerprint" in data.files else ""
+        return index
+
+
+def benchmark(vectors: np.ndarray, queries: np.ndarray, k: int, n_probes: List[int]) -> None:
+    """Prints recall@k and query latency of the index against brute force."""
+    index = IVFIndex().build(vectors, list(range(len(vectors))))
+    print(f"{len(vectors)} vetores, dim {vectors.shape[1]}, {index.n_lists} listas, {len(queries)} consultas")
+
+    start = time.perf_counter()
+    exact = [{label for label, _ in index.exact_top_k(q, k)} for q in queries]
+    exact_time = (time.perf_counter() - start) / len(queries)
+    print(f"{'n_probe':>8}  {'recall@' + str(k):>10}  {'ms/consulta':>12}")
+    print(f"{'exato':>8}  {1.0:>10.3f}  {exact_time * 1000:>12.3f}")
+
+    for n_probe in n_probes:
+        start = time.perf_counter()
+        approx = [{label for label, _ in index.top_k(q, k, n_probe)} for q in queries]
+        approx_time = (time.perf_counter() - start) / len(queries)
+        recall = np.mean([len(a & e) / len(e) for a, e in zip(approx, exact)])
+        print(f"{n_probe:>8}  {recall:>10.3f}  {approx_time * 1000:>12.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara o índice IVF com a busca exata")
+    parser.add_argument("-m", "--model", type=str, default="all-mpnet-base-v2")
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        default=0,
+        help="Usa N vetores aleatórios agrupados em vez dos itens dos currículos"
+    )
+    parser.add_argument("-k", "--top-k", type=int, default=10)
+    parser.add_argument("-p", "--n-probe", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(64, 384))
+        vectors = centers[rng.integers(64, size=args.synthetic)] + 0.5 * rng.normal(size=(args.synthetic, 384))
+        queries = centers[rng.integers(64, size=100)] + 0.5 * rng.normal(size=(100, 384))
+    else:
+        from ranking.engine import load_members
+        from similarity.similarity import SentenceTransformerSimilarity
+
+        similarity = SentenceTransformerSimilarity(args.model)
+        members = load_members("../data/ppgcc")
+        vectors = np.concatenate([
+            items for member in members for items in similarity.item_embeddings(member.info).values()
+        ])
+        summaries = ["./summary/sum.txt", "./summary/sum2.txt", "./summary/sum3.txt", "./summary/sum4.txt"]
+        queries = similarity.model.encode([open(f, encoding="utf-8").read() for f in summaries])
+
+    benchmark(vectors, queries, args.top_k, args.n_probe)
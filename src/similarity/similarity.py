@@ -1,12 +1,371 @@
 from sentence_transformers import SentenceTransformer
-from typing import List
+from typing import Dict, List, Optional, Set, Tuple
+import copy
+import hashlib
+import json
+import os
 import numpy as np
+from similarity.ann import IVFIndex, normalize
+
+# sections of get_info() used to build the professor embedding
+SECTIONS = ["research_areas", "periodic_papers", "congress_papers", "projects"]
+
+
+def profile_hash(info: dict) -> str:
+    """Hash of the sections of a professor that are embedded."""
+    content = [info.get("lattes_id")] + [info.get(section) or [] for section in SECTIONS]
+    return hashlib.sha1(json.dumps(content, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def model_fingerprint(model_name: str) -> str:
+    """Identifies the weights of a SentenceTransformer model, not only its name.
+
+    The model directory (a local path, or the snapshot of the model in the Hugging Face
+    cache) is hashed: the content of its small files (configs, tokenizer) and the size and
+    mtime of the large ones (weights). If the directory cannot be found, the name is used.
+    """
+    path = model_name
+    if not os.path.isdir(path):
+        try:
+            from huggingface_hub import snapshot_download
+            repo_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+            path = snapshot_download(
+                repo_id, cache_dir=os.environ.get("SENTENCE_TRANSFORMERS_HOME"), local_files_only=True
+            )
+        except Exception:
+            return model_name
+
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            stat = os.stat(file_path)
+            digest.update(f"{os.path.relpath(file_path, path)}:{stat.st_size}".encode("utf-8"))
+            if stat.st_size < 1 << 20:
+                with open(file_path, "rb") as file:
+                    digest.update(file.read())
+            else:
+                digest.update(str(stat.st_mtime_ns).encode())
+    return f"{model_name}@{digest.hexdigest()}"
+
 
 class SentenceTransformerSimilarity:
-    def __init__(self, model_name: str):
+    def __init__(
+        self,
+        model_name: str,
+        model: Optional[SentenceTransformer] = None,
+        fingerprint: Optional[str] = None,
+    ):
         self.model_name = model_name
-        self.model = SentenceTransformer(model_name)
-        
+        # an already loaded model can be shared by several instances (e.g. one per corpus shard)
+        self.model = model if model is not None else SentenceTransformer(model_name)
+        # name and version of the weights, see model_fingerprint()
+        self.model_fingerprint = fingerprint or model_fingerprint(model_name)
+        # embeddings by lattes_id, so a batch of queries encodes each CV once
+        self._item_embeddings: Dict[str, Dict[str, np.ndarray]] = {}
+        self._professor_embeddings: Dict[str, np.ndarray | None] = {}
+        # query embeddings of the last batch, reused by explain()
+        self._query_embeddings: Dict[Tuple[str, str], np.ndarray] = {}
+        # approximate nearest neighbour indexes, see build_ann()
+        self.professor_index: Optional[IVFIndex] = None
+        self.item_index: Optional[IVFIndex] = None
+
+    def similarity_scores(self, queries: List[Tuple[str, str]], infos: List[dict]) -> np.ndarray:
+        """Scores several (theme, summary) queries against several professors at once.
+
+        The queries are encoded in one batch and each professor embedding is computed
+        only once per instance. Professors without any section get a score of 0.0.
+
+        Returns:
+            np.ndarray: Matrix (len(queries), len(infos)) of similarities.
+        """
+        if not queries or not infos:
+            return np.zeros((len(queries), len(infos)))
+        return self.scores_from_embeddings(self.query_embeddings(queries), self.professor_matrix(infos))
+
+    def _cosine(self) -> bool:
+        return getattr(self.model, "similarity_fn_name", None) in (None, "cosine")
+
+    def professor_matrix(self, infos: List[dict]) -> np.ndarray:
+        """The professor embeddings stacked in a matrix (len(infos), dim), to be scored by
+        `scores_from_embeddings`. It can be kept while the professors do not change.
+
+        With cosine similarity the rows are scaled to unit length. Professors without any
+        section get a row of zeros, so their score is 0.0.
+        """
+        embeddings = [self.professor_embedding(info) for info in infos]
+        dim = next((len(e) for e in embeddings if e is not None), 0)
+        if not infos:
+            return np.zeros((0, dim), dtype=np.float32)
+        matrix = np.stack([e if e is not None else np.zeros(dim) for e in embeddings]).astype(np.float32)
+        return normalize(matrix) if self._cosine() else matrix
+
+    def scores_from_embeddings(self, query_embeddings: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+        """Scores encoded queries against a `professor_matrix` (or some of its rows).
+
+        Returns:
+            np.ndarray: Matrix (len(query_embeddings), len(matrix)) of similarities.
+        """
+        if matrix.shape[1] == 0:
+            # no professor has any section
+            return np.zeros((len(query_embeddings), len(matrix)))
+        if self._cosine():
+            return normalize(np.asarray(query_embeddings, dtype=np.float32)) @ matrix.T
+        return np.asarray(self.model.similarity(query_embeddings, matrix))
+
+    def query_embeddings(self, queries: List[Tuple[str, str]]) -> np.ndarray:
+        """Mean of the theme and summary embeddings of each query, encoded in one batch."""
+        themes = self.model.encode([theme for theme, _ in queries])
+        summaries = self.model.encode([summary for _, summary in queries])
+        embeddings = np.mean([themes, summaries], axis=0)
+
+        self._query_embeddings = dict(zip(queries, embeddings))
+        return embeddings
+
+    def use_query_embeddings(self, queries: List[Tuple[str, str]], embeddings: np.ndarray) -> None:
+        """Keeps query embeddings encoded by another instance with the same model (e.g. of
+        another shard), so `explain` and `top_k_items` do not encode them again."""
+        self._query_embeddings = dict(zip(queries, embeddings))
+
+    def query_embedding(self, theme: str, summary: str) -> np.ndarray:
+        """Embedding of a query, reused from the last batch if it was there."""
+        query_embedding = self._query_embeddings.get((theme, summary))
+        if query_embedding is None:
+            query_embedding = self.query_embeddings([(theme, summary)])[0]
+        return query_embedding
+
+    def item_embeddings(self, info: dict) -> Dict[str, np.ndarray]:
+        """Embedding of every item of each non-empty section, cached by lattes_id.
+
+        Returns:
+            Dict[str, np.ndarray]: Section name -> matrix (n_items, dim), in the order of `info[section]`.
+        """
+        key = info.get("lattes_id")
+        if key in self._item_embeddings:
+            return self._item_embeddings[key]
+
+        embeddings = {
+            section: self.model.encode(info[section])
+            for section in SECTIONS
+            if info.get(section)
+        }
+
+        if key is not None:
+            self._item_embeddings[key] = embeddings
+        return embeddings
+
+    def item_embeddings_batch(self, infos: List[dict]) -> None:
+        """Encodes the items of several professors in a single `encode` call and caches them.
+
+        Professors already in the cache (or without a lattes_id) are skipped.
+        """
+        pending = [
+            (info, section)
+            for info in infos
+            if info.get("lattes_id") is not None and info.get("lattes_id") not in self._item_embeddings
+            for section in SECTIONS
+            if info.get(section)
+        ]
+        texts = [item for info, section in pending for item in info[section]]
+        if not texts:
+            return
+        embeddings = self.model.encode(texts)
+
+        start = 0
+        for info, section in pending:
+            end = start + len(info[section])
+            self._item_embeddings.setdefault(info.get("lattes_id"), {})[section] = embeddings[start:end]
+            start = end
+
+    def professor_embedding(self, info: dict) -> np.ndarray | None:
+        """Mean of the section embeddings of a professor, cached by lattes_id."""
+        key = info.get("lattes_id")
+        if key in self._professor_embeddings:
+            return self._professor_embeddings[key]
+
+        section_embeddings = [items.mean(axis=0) for items in self.item_embeddings(info).values()]
+        embedding = np.mean(section_embeddings, axis=0) if section_embeddings else None
+
+        if key is not None:
+            self._professor_embeddings[key] = embedding
+        return embedding
+
+    def save_embeddings(self, path: str, lattes_ids: Optional[Set[str]] = None) -> None:
+        """Saves the cached item embeddings (or only those of some professors) to a .npz file."""
+        arrays = {
+            f"{lattes_id}|{section}": embeddings
+            for lattes_id, sections in self._item_embeddings.items()
+            if lattes_ids is None or lattes_id in lattes_ids
+            for section, embeddings in sections.items()
+        }
+        np.savez(path, **arrays)
+
+    def load_embeddings(self, path: str) -> None:
+        """Loads item embeddings saved by `save_embeddings` into the cache."""
+        with np.load(path) as data:
+            for key in data.files:
+                lattes_id, section = key.split("|", 1)
+                self._item_embeddings.setdefault(lattes_id, {})[section] = data[key]
+
+    def forget(self, lattes_ids: Set[str]) -> None:
+        """Drops the cached embeddings of some professors, e.g. after their CVs changed."""
+        for lattes_id in lattes_ids:
+            self._item_embeddings.pop(lattes_id, None)
+            self._professor_embeddings.pop(lattes_id, None)
+
+    def without(self, lattes_ids: Set[str]) -> "SentenceTransformerSimilarity":
+        """A copy that shares the model, the cached embeddings and the ANN indexes, minus
+        the embeddings of some professors.
+
+        Changes to the copy (`forget`, `update_ann`) do not affect this instance, so it can
+        keep answering queries while the copy is updated.
+        """
+        similarity = SentenceTransformerSimilarity(self.model_name, self.model, self.model_fingerprint)
+        similarity._item_embeddings = dict(self._item_embeddings)
+        similarity._professor_embeddings = dict(self._professor_embeddings)
+        similarity.forget(lattes_ids)
+        # the indexes assign new arrays on every update, so a shallow copy is enough
+        similarity.professor_index = copy.copy(self.professor_index)
+        similarity.item_index = copy.copy(self.item_index)
+        return similarity
+
+    def update_ann(self, lattes_ids: Set[str], infos: List[dict]) -> None:
+        """Replaces the rows of some professors in the IVF indexes, without re-running k-means.
+
+        Args:
+            lattes_ids (Set[str]): The professors that were added, changed or removed.
+            infos (List[dict]): Every professor of the index, with their current content.
+        """
+        if self.professor_index is None or self.item_index is None:
+            self.build_ann(infos)
+            return
+
+        self.professor_index.remove(lambda label: label in lattes_ids)
+        self.item_index.remove(lambda label: label[0] in lattes_ids)
+
+        professors, professor_labels = [], []
+        items, item_labels = [], []
+        for info in infos:
+            if info.get("lattes_id") not in lattes_ids:
+                continue
+            embedding = self.professor_embedding(info)
+            if embedding is None:
+                continue
+            professors.append(embedding)
+            professor_labels.append(info.get("lattes_id"))
+
+            for section, embeddings in self.item_embeddings(info).items():
+                items.append(embeddings)
+                item_labels.extend((info.get("lattes_id"), section, i) for i in range(len(embeddings)))
+
+        if professors:
+            self.professor_index.add(np.stack(professors), professor_labels)
+            self.item_index.add(np.concatenate(items), item_labels)
+        self.professor_index.fingerprint = self.item_index.fingerprint = self.ann_fingerprint(infos)
+
+    def build_ann(self, infos: List[dict], n_probe: int = 4) -> None:
+        """Builds the IVF indexes over the professor and item embeddings.
+
+        Professors are labeled by lattes_id and items by (lattes_id, section, position
+        in info[section]). Cosine similarity is used, as in `model.similarity`.
+        """
+        professors, professor_labels = [], []
+        items, item_labels = [], []
+        for info in infos:
+            embedding = self.professor_embedding(info)
+            if embedding is None:
+                continue
+            professors.append(embedding)
+            professor_labels.append(info.get("lattes_id"))
+
+            for section, embeddings in self.item_embeddings(info).items():
+                items.append(embeddings)
+                item_labels.extend((info.get("lattes_id"), section, i) for i in range(len(embeddings)))
+
+        self.professor_index = IVFIndex(n_probe=n_probe).build(np.stack(professors), professor_labels)
+        self.item_index = IVFIndex(n_probe=n_probe).build(np.concatenate(items), item_labels)
+        self.professor_index.fingerprint = self.item_index.fingerprint = self.ann_fingerprint(infos)
+
+    def ann_fingerprint(self, infos: List[dict]) -> str:
+        """Hash of the model fingerprint and of the content of every professor of an index."""
+        digest = hashlib.sha1(self.model_fingerprint.encode("utf-8"))
+        for content_hash in sorted(profile_hash(info) for info in infos):
+            digest.update(content_hash.encode())
+        return digest.hexdigest()
+
+    def ann_is_current(self, infos: List[dict]) -> bool:
+        """Whether the indexes were built with this model over exactly these professors."""
+        if self.professor_index is None or self.item_index is None:
+            return False
+        fingerprint = self.ann_fingerprint(infos)
+        return self.professor_index.fingerprint == fingerprint == self.item_index.fingerprint
+
+    def save_ann(self, path: str) -> None:
+        """Saves the indexes to <path>.professors.npz and <path>.items.npz."""
+        self.professor_index.save(path + ".professors.npz")
+        self.item_index.save(path + ".items.npz")
+
+    def load_ann(self, path: str) -> None:
+        """Loads the indexes saved by `save_ann`."""
+        self.professor_index = IVFIndex.load(path + ".professors.npz")
+        self.item_index = IVFIndex.load(path + ".items.npz")
+
+    def top_k_professors(self, query_embedding: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Approximate k professors closest to an encoded query (see `query_embeddings`),
+        as (lattes_id, score)."""
+        return self.professor_index.top_k(query_embedding, k)
+
+    def top_k_items(self, theme: str, summary: str, k: int) -> List[Tuple[Tuple[str, str, int], float]]:
+        """Approximate k items (papers, projects, research lines) closest to a query.
+
+        Returns:
+            List[Tuple[Tuple[str, str, int], float]]: ((lattes_id, section, position), score), best first.
+        """
+        query_embedding = self.query_embedding(theme, summary)
+        return self.item_index.top_k(query_embedding, k)
+
+    def explain(self, theme: str, summary: str, infos: List[dict], top_n: int = 3) -> List[Dict[str, List[Tuple[str, float]]]]:
+        """Finds the items of each professor that are closest to the query.
+
+        The cached item embeddings of all professors are stacked and scored against
+        the query with a single similarity call.
+
+        Args:
+            theme (str): Title of the thesis.
+            summary (str): Summary of the thesis.
+            infos (List[dict]): The professors to explain, e.g. the top of a ranking.
+            top_n (int): Number of items kept per section.
+
+        Returns:
+            List[Dict[str, List[Tuple[str, float]]]]: For each professor, section -> [(item, score)],
+                best score first.
+        """
+        query_embedding = self.query_embedding(theme, summary)
+
+        blocks = []
+        for i, info in enumerate(infos):
+            for section, embeddings in self.item_embeddings(info).items():
+                blocks.append((i, section, embeddings))
+
+        explanations = [{} for _ in infos]
+        if not blocks:
+            return explanations
+
+        matrix = np.concatenate([embeddings for _, _, embeddings in blocks])
+        scores = np.asarray(self.model.similarity(query_embedding, matrix))[0]
+
+        offset = 0
+        for i, section, embeddings in blocks:
+            section_scores = scores[offset:offset + len(embeddings)]
+            offset += len(embeddings)
+
+            best = np.argsort(-section_scores)[:top_n]
+            explanations[i][section] = [
+                (infos[i][section][j], float(section_scores[j])) for j in best
+            ]
+        return explanations
+
     def similarity_score(self, theme: str, summary: str, info: dict) -> float:
         theme_embedding = self._calculate_embedding_theme(theme, summary)
 